@@ -0,0 +1,99 @@
+"""Micro-benchmark of the client side overhead of Pipedream.call.
+
+    python benchmarks/bench_call.py [--number 20000] [--json]
+
+Requests are answered by a stub transport adapter returning a canned
+response, so only the work done by the client and requests is timed.
+Every case is timed with the prepared request fast path of
+Pipedream._send and with a plain Session.request for comparison.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pipedreamer import Pipedream  # noqa: E402
+
+BODY = b'{"page_info": {"count": 1, "end_cursor": null}, "data": [{"id": 1}]}'
+
+CASES = [
+    ('users_me', lambda z: z.users_me()),
+    ('source_event_summaries', lambda z: z.source_event_summaries(
+        'dc_BVu1KeS', expand='event', limit=1)),
+    ('source_update', lambda z: z.source_update(
+        'dc_BVu1KeS', {'active': False})),
+]
+
+
+class StubAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter answering every request with BODY."""
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = BODY
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def _plain_send(z):
+    """Replace the fast path of z with a plain Session.request."""
+    def send(method, url, params, json, data, files, headers, stream=False):
+        return z.client.request(method, url, params=params, json=json,
+                                data=data, headers=headers, files=files,
+                                stream=stream, **z.client_args)
+    z._send = send
+
+
+def run(number, repeat):
+    results = []
+    for name, case in CASES:
+        timings = {}
+        for path in ('plain', 'fast'):
+            z = Pipedream('bench-token', coalesce=False)
+            z.client.mount('https://', StubAdapter())
+            if path == 'plain':
+                _plain_send(z)
+            case(z)
+            timings[path] = min(timeit.repeat(lambda: case(z), number=number,
+                                              repeat=repeat)) / number
+        results.append({
+            'case': name,
+            'plain_us': timings['plain'] * 1e6,
+            'fast_us': timings['fast'] * 1e6,
+            'speedup': timings['plain'] / timings['fast'],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.number, args.repeat)
+    if args.json:
+        json.dump({'environ_size': len(os.environ), 'results': results},
+                  sys.stdout, indent=2)
+        print()
+        return
+
+    print('%d environment variables' % len(os.environ))
+    print('%-24s %12s %12s %8s' % ('case', 'plain (us)', 'fast (us)', 'x'))
+    for r in results:
+        print('%-24s %12.1f %12.1f %8.2f' % (
+            r['case'], r['plain_us'], r['fast_us'], r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
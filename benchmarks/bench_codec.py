@@ -0,0 +1,81 @@
+"""Compare the JSON codecs on event_summaries payloads.
+
+    python benchmarks/bench_codec.py [--count 100] [--json]
+
+Times decoding a page from bytes and encoding it back to bytes with every
+installed codec, relative to the standard library.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pipedreamer.codec import CODECS  # noqa: E402
+from payloads import event_summaries_page  # noqa: E402
+
+
+def run(count, expand, repeat):
+    page = event_summaries_page(count, expand=expand)
+    body = json.dumps(page).encode('utf-8')
+    results = []
+
+    for name, cls in sorted(CODECS.items()):
+        try:
+            codec = cls()
+        except ImportError:
+            continue
+
+        number = max(1, 2000 // count)
+        loads = min(timeit.repeat(lambda: codec.loads(body),
+                                  number=number, repeat=repeat)) / number
+        dumps = min(timeit.repeat(lambda: codec.dumps(page),
+                                  number=number, repeat=repeat)) / number
+        results.append({
+            'codec': name,
+            'page_bytes': len(body),
+            'events': count,
+            'expand': expand,
+            'loads_s': loads,
+            'dumps_s': dumps,
+            'loads_mb_s': len(body) / loads / 1e6,
+        })
+
+    baseline = dict((r['codec'], r) for r in results)['json']
+    for r in results:
+        r['loads_speedup'] = baseline['loads_s'] / r['loads_s']
+        r['dumps_speedup'] = baseline['dumps_s'] / r['dumps_s']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100,
+                        help='events per page (default: 100)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for expand in (False, True):
+        results.extend(run(args.count, expand, args.repeat))
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print('%-7s %-7s %10s %12s %12s %8s %8s' % (
+        'codec', 'expand', 'bytes', 'loads (ms)', 'dumps (ms)',
+        'x loads', 'x dumps'))
+    for r in results:
+        print('%-7s %-7s %10d %12.3f %12.3f %8.2f %8.2f' % (
+            r['codec'], r['expand'], r['page_bytes'], r['loads_s'] * 1e3,
+            r['dumps_s'] * 1e3, r['loads_speedup'], r['dumps_speedup']))
+
+
+if __name__ == '__main__':
+    main()
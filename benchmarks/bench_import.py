@@ -0,0 +1,116 @@
+"""Benchmark of the import and startup time of the pipedreamer package.
+
+    python benchmarks/bench_import.py [--repeat 20] [--json] [--modules]
+
+Every case runs in a fresh interpreter, which times its statements with
+perf_counter so that the startup of Python itself isn't counted. With
+--modules, the slowest imports of each case (python -X importtime) are
+listed as well.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CASES = [
+    ('import', 'import pipedreamer'),
+    ('client', 'from pipedreamer import Pipedream; Pipedream("t")'),
+    ('endpoint', 'from pipedreamer import Pipedream; '
+                 'Pipedream("t").source_event_summaries'),
+    ('async', 'from pipedreamer import AsyncPipedream'),
+]
+
+CHILD = """\
+import time
+t = time.perf_counter()
+%s
+print(time.perf_counter() - t)
+"""
+
+
+def _run(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable] + args, env=env, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+
+def time_case(statement, repeat):
+    timings = sorted(float(_run(['-c', CHILD % statement]).stdout)
+                     for _ in range(repeat))
+    return {
+        'min_ms': timings[0] * 1e3,
+        'median_ms': timings[len(timings) // 2] * 1e3,
+    }
+
+
+def _imports(statement):
+    """Return {module: cumulative microseconds} of the top level imports
+    of an interpreter running statement.
+    """
+    modules = {}
+    output = _run(['-X', 'importtime', '-c', statement]).stderr
+    for line in output.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # Nested imports are indented under the module importing them
+        if not name.startswith('  '):
+            modules[name.strip()] = int(parts[1])
+    return modules
+
+
+def slowest_modules(statement, count=8):
+    """Return [(cumulative microseconds, module)] of the slowest imports
+    of statement, leaving out those of the startup of Python.
+    """
+    startup = _imports('pass')
+    modules = [(us, name) for name, us in _imports(statement).items()
+               if name not in startup]
+    return sorted(modules, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true',
+                        help='print machine-readable results')
+    parser.add_argument('--modules', action='store_true',
+                        help='list the slowest imports of each case')
+    args = parser.parse_args()
+
+    results = []
+    for name, statement in CASES:
+        try:
+            result = time_case(statement, args.repeat)
+        except subprocess.CalledProcessError as e:
+            # e.g. aiohttp isn't installed
+            result = {'error': e.stderr.strip().splitlines()[-1]}
+        result['case'] = name
+        if args.modules and 'error' not in result:
+            result['modules'] = slowest_modules(statement)
+        results.append(result)
+
+    if args.json:
+        json.dump({'python': sys.version.split()[0], 'results': results},
+                  sys.stdout, indent=2)
+        print()
+        return
+
+    print('%-10s %10s %12s' % ('case', 'min (ms)', 'median (ms)'))
+    for r in results:
+        if 'error' in r:
+            print('%-10s %s' % (r['case'], r['error']))
+            continue
+        print('%-10s %10.1f %12.1f' % (r['case'], r['min_ms'],
+                                        r['median_ms']))
+        for us, module in r.get('modules', ()):
+            print('    %8.1f ms  %s' % (us / 1e3, module))
+
+
+if __name__ == '__main__':
+    main()
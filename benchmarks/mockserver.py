@@ -0,0 +1,212 @@
+"""Local stand-in for api.pipedream.com/v1 for the benchmarks.
+
+    python benchmarks/mockserver.py [--port 8080] [--latency 0.02]
+                                    [--rate-limit 0.05] [--errors 0.01]
+
+Serves cursor-paginated event summaries and source lists, and can inject
+latency, 429 responses with a Retry-After header and 5xx responses.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from payloads import event_summaries_page
+
+_EVENT_SUMMARIES = re.compile(
+    r'^/v1/(?:sources|workflows)/([^/]+)/(?:\$errors/)?event_summaries$')
+_SOURCE = re.compile(r'^/v1/(sources|webhooks)/([^/]+)$')
+
+
+class MockPipedream(ThreadingHTTPServer):
+    """Threaded HTTP server answering like the Pipedream REST API.
+
+    Every event summaries stream holds events summaries, served newest
+    first like the API in pages of up to page_size (or the limit query
+    parameter), using the number of events served so far as cursor. Rendered pages are
+    cached so the server costs little next to the client being measured.
+    """
+
+    daemon_threads = True
+    # Don't drop connections of heavily concurrent benchmarks
+    request_queue_size = 1024
+
+    def __init__(self, address=('127.0.0.1', 0), events=1000, page_size=100,
+                 sources=100, expand=True, latency=0.0, rate_limit=0.0,
+                 retry_after=0.05, errors=0.0, seed=0):
+        """
+        Parameters:
+        events - Events per event summaries stream.
+        page_size - Default page size.
+        sources - Number of sources listed by /users/me/sources/.
+        expand - Include the event payloads, as with expand=event.
+        latency - Seconds to wait before answering each request.
+        rate_limit - Share of requests answered with 429.
+        retry_after - Retry-After of the 429 responses.
+        errors - Share of requests answered with 503.
+        """
+        ThreadingHTTPServer.__init__(self, address, _Handler)
+        self.events = events
+        self.page_size = page_size
+        self.sources = sources
+        self.expand = expand
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.errors = errors
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'rate_limited': 0, 'errors': 0}
+        self._pages = {}
+
+    @property
+    def url(self):
+        return 'http://%s:%d/v1' % self.server_address[:2]
+
+    def start(self):
+        """Serve from a background thread and return the server."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def fault(self):
+        """Return the status code of an injected failure or None."""
+        with self.lock:
+            self.counts['requests'] += 1
+            roll = self.random.random()
+            if roll < self.rate_limit:
+                self.counts['rate_limited'] += 1
+                return 429
+            if roll < self.rate_limit + self.errors:
+                self.counts['errors'] += 1
+                return 503
+        return None
+
+    def page(self, start, limit):
+        key = (start, limit)
+        body = self._pages.get(key)
+        if body is None:
+            count = max(0, min(limit, self.events - start))
+            page = event_summaries_page(count, start, self.events,
+                                        self.expand)
+            if count:
+                page['page_info']['end_cursor'] = str(start + count)
+            body = json.dumps(page).encode('utf-8')
+            self._pages[key] = body
+        return body
+
+    def source_list(self):
+        body = self._pages.get('sources')
+        if body is None:
+            data = [{'id': 'dc_%08d' % i, 'name': 'source-%d' % i,
+                     'component_id': 'sc_%d' % i, 'active': True,
+                     'configured_props': {}} for i in range(self.sources)]
+            body = json.dumps({
+                'page_info': {'total_count': len(data), 'count': len(data),
+                              'start_cursor': None, 'end_cursor': None},
+                'data': data,
+            }).encode('utf-8')
+            self._pages['sources'] = body
+        return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body=b'', headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        # Send headers and body in one write, two small writes would hit
+        # the delayed ACK of the client and add 40ms to every request
+        self._headers_buffer.append(b'\r\n')
+        self._headers_buffer.append(body)
+        self.flush_headers()
+
+    def _json(self, body):
+        self._send(200, body, {'Content-Type': 'application/json'})
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        fault = server.fault()
+        if fault == 429:
+            return self._send(429, b'{"error": "rate limited"}', {
+                'Content-Type': 'application/json',
+                'Retry-After': str(server.retry_after)})
+        if fault:
+            return self._send(fault, b'{"error": "unavailable"}',
+                              {'Content-Type': 'application/json'})
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if self.command != 'GET':
+            if _SOURCE.match(url.path):
+                return self._json(b'{}')
+            return self._send(404)
+
+        if _EVENT_SUMMARIES.match(url.path):
+            start = int(query.get('after', ['0'])[0])
+            limit = int(query.get('limit', [server.page_size])[0])
+            return self._json(server.page(start, limit))
+        if url.path in ('/v1/users/me/sources/', '/v1/users/me/sources'):
+            return self._json(server.source_list())
+        if url.path == '/v1/users/me':
+            return self._json(b'{"data": {"id": "u_mock", '
+                              b'"username": "bench"}}')
+        match = _SOURCE.match(url.path)
+        if match:
+            return self._json(json.dumps(
+                {'data': {'id': match.group(2)}}).encode('utf-8'))
+        return self._send(404)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--sources', type=int, default=100)
+    parser.add_argument('--no-expand', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=0.05)
+    parser.add_argument('--errors', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockPipedream((args.host, args.port), events=args.events,
+                           page_size=args.page_size, sources=args.sources,
+                           expand=not args.no_expand, latency=args.latency,
+                           rate_limit=args.rate_limit,
+                           retry_after=args.retry_after, errors=args.errors)
+    # The benchmark runner reads the URL from the first line
+    print(server.url)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
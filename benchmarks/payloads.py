@@ -0,0 +1,66 @@
+"""Realistic Pipedream API payloads for the benchmarks."""
+import random
+
+
+def event_summary(i, expand=True, rng=random):
+    """An event summary as returned by source_event_summaries."""
+    summary = {
+        'id': '%d-%d' % (1594000000000 + i, i % 3),
+        'indexed_at_ms': 1594000000000 + i,
+        'event': None,
+        'metadata': {
+            'emit_id': '1fRcxkSxYdlz1TZ0dUHMBy%08d' % i,
+            'name': '',
+            'emitter_id': 'dc_%08d' % (i % 50),
+        },
+    }
+    if expand:
+        summary['event'] = {
+            'method': 'POST',
+            'path': '/',
+            'query': {},
+            'client_ip': '10.0.%d.%d' % (i % 256, rng.randrange(256)),
+            'url': 'https://enpsxxxxxxxx.m.pipedream.net/',
+            'headers': {
+                'host': 'enpsxxxxxxxx.m.pipedream.net',
+                'content-length': '%d' % rng.randrange(100, 2000),
+                'content-type': 'application/json',
+                'user-agent': 'curl/7.68.0',
+                'accept': '*/*',
+            },
+            'body': {
+                'order_id': i,
+                'customer': {'name': 'Customer %d' % i,
+                             'email': 'customer%d@example.com' % i,
+                             'vip': i % 7 == 0},
+                'items': [{'sku': 'SKU-%05d' % rng.randrange(100000),
+                           'qty': rng.randrange(1, 5),
+                           'price': round(rng.uniform(1, 500), 2)}
+                          for _ in range(rng.randrange(1, 6))],
+                'note': u'Livraison prévue – %d' % i,
+            },
+        }
+    return summary
+
+
+def event_summaries_page(count=100, start=0, total=None, expand=True,
+                         seed=0):
+    """A page of event summaries with its page_info.
+
+    Like the API, events come newest first: the page holds the count
+    events following the start newest of a stream of total events.
+    """
+    if total is None:
+        total = start + count
+    rng = random.Random(seed + start)
+    data = [event_summary(total - 1 - start - i, expand, rng)
+            for i in range(count)]
+    return {
+        'page_info': {
+            'total_count': total,
+            'count': len(data),
+            'start_cursor': data[0]['id'] if data else None,
+            'end_cursor': data[-1]['id'] if data else None,
+        },
+        'data': data,
+    }
@@ -0,0 +1,204 @@
+"""Benchmark the client against a local mock of the Pipedream API.
+
+    python benchmarks/run.py [--scenario call] [--iterations 200]
+                             [--latency 0.0] [--metrics]
+                             [--output results.json]
+
+Every scenario runs in its own process, against its own mock server, so
+that peak RSS isn't inflated by the other scenarios. Reports throughput,
+latency percentiles, the peak of traced allocations and the peak RSS of
+the client process. --metrics attaches a MetricsCollector to the client,
+to measure the cost of the hooks.
+
+Scenarios:
+    call - single GET requests with Pipedream.call
+    paginate - walking all pages of event_summaries with iter_items
+    fanout - Pipedream.map over many sources with a pool of threads
+    retry - GET requests against a server answering 429 and 503
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mockserver import MockPipedream  # noqa: E402
+
+SCENARIOS = ('call', 'paginate', 'fanout', 'retry')
+
+# Mock server settings of every scenario
+SERVERS = {
+    'call': {},
+    'paginate': {'events': 2000, 'page_size': 100},
+    'fanout': {'sources': 200},
+    'retry': {'rate_limit': 0.2, 'retry_after': 0.01, 'errors': 0.1},
+}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values))) - 1))
+    return values[k]
+
+
+def _client(url, scenario, metrics=False):
+    from pipedreamer import MetricsCollector, Pipedream, RetryPolicy
+
+    kwargs = {'base_url': url, 'pool_maxsize': 16}
+    if scenario == 'retry':
+        kwargs['retry_policy'] = RetryPolicy(retry_on=[429, 503],
+                                             max_retries=20, backoff=0.01)
+    if metrics:
+        kwargs['hooks'] = MetricsCollector().hooks()
+    return Pipedream('bench-token', **kwargs)
+
+
+def _operation(z, scenario):
+    """Return a function running one measured operation, and the number
+    of items each run of it handles.
+    """
+    if scenario in ('call', 'retry'):
+        return lambda: z.users_me(), 1
+    if scenario == 'paginate':
+        def walk():
+            for _ in z.iter_items(z.source_event_summaries, 'dc_bench',
+                                  expand='event', limit=100):
+                pass
+        return walk, 2000
+    if scenario == 'fanout':
+        ids = ['dc_%08d' % i for i in range(200)]
+
+        def fanout():
+            for r in z.map(z.source_update, ids, concurrency=16,
+                           data={'active': True}):
+                if r.error:
+                    raise r.error
+        return fanout, len(ids)
+    raise ValueError("Unknown scenario: %s" % scenario)
+
+
+def measure(url, scenario, iterations, warmup, metrics=False):
+    """Run scenario in this process and return its results."""
+    z = _client(url, scenario, metrics)
+    operation, items = _operation(z, scenario)
+    if scenario in ('paginate', 'fanout'):
+        iterations = max(1, iterations // 20)
+
+    for _ in range(warmup):
+        operation()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    # Allocations are traced in a separate pass, tracing slows everything
+    tracemalloc.start()
+    operation()
+    traced_current, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'metrics': metrics,
+        'iterations': iterations,
+        'items_per_iteration': items,
+        'elapsed_s': elapsed,
+        'ops_per_s': iterations / elapsed,
+        'items_per_s': iterations * items / elapsed,
+        'latency_s': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1],
+        },
+        'alloc_peak_bytes': traced_peak,
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * (1 if sys.platform == 'darwin' else 1024),
+    }
+
+
+def run(scenario, iterations, warmup, latency, metrics=False):
+    """Start a mock server and measure scenario in a child process."""
+    settings = dict(SERVERS[scenario], latency=latency)
+    server = MockPipedream(**settings).start()
+    command = [sys.executable, __file__, '--child', scenario,
+               '--url', server.url, '--iterations', str(iterations),
+               '--warmup', str(warmup)]
+    if metrics:
+        command.append('--metrics')
+    try:
+        output = subprocess.check_output(command)
+    finally:
+        server.shutdown()
+        server.server_close()
+    result = json.loads(output.decode('utf-8'))
+    result['server'] = dict(settings, **server.counts)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='scenario to run, repeatable (default: all)')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the server waits before answering')
+    parser.add_argument('--metrics', action='store_true',
+                        help='attach a MetricsCollector to the client')
+    parser.add_argument('--output', help='write the results as JSON to '
+                        'this file, - for stdout')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        json.dump(measure(args.url, args.child, args.iterations,
+                          args.warmup, args.metrics), sys.stdout)
+        return
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'scenarios': [run(s, args.iterations, args.warmup, args.latency,
+                          args.metrics)
+                      for s in args.scenario or SCENARIOS],
+    }
+
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print('%-9s %10s %12s %9s %9s %9s %11s %9s' % (
+        'scenario', 'ops/s', 'items/s', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)',
+        'alloc (KB)', 'RSS (MB)'))
+    for r in results['scenarios']:
+        lat = r['latency_s']
+        print('%-9s %10.1f %12.1f %9.2f %9.2f %9.2f %11.1f %9.1f' % (
+            r['scenario'], r['ops_per_s'], r['items_per_s'],
+            lat['p50'] * 1e3, lat['p90'] * 1e3, lat['p99'] * 1e3,
+            r['alloc_peak_bytes'] / 1e3, r['peak_rss_bytes'] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,39 @@
-from .pipedreamer import Pipedream
-from .pipedreamer import PipedreamError, AuthenticationError, RateLimitError
+import importlib
+
+# Module of every public name. The modules are imported on first access to
+# one of their names (PEP 562), so that importing the package doesn't
+# import requests, aiohttp and the rest until they are needed.
+_EXPORTS = {
+    'Pipedream': 'pipedreamer',
+    'PipedreamError': 'pipedreamer',
+    'AuthenticationError': 'pipedreamer',
+    'RateLimitError': 'pipedreamer',
+    'MapResult': 'pipedreamer',
+    'RetryPolicy': 'pipedreamer',
+    'RetryBudget': 'pipedreamer',
+    'RateLimiter': 'ratelimit',
+    'FileRateLimiter': 'ratelimit',
+    'ResponseCache': 'cache',
+    'DiskCache': 'cache',
+    'MetricsCollector': 'metrics',
+    'RequestsTransport': 'transport',
+    'HTTPXTransport': 'transport',
+    'KeepAliveAdapter': 'transport',
+    'AsyncPipedream': 'pipedreamer_async',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,388 @@
+import collections
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlencode
+
+
+CacheEntry = collections.namedtuple(
+    'CacheEntry', ['status', 'headers', 'content', 'stored_at'])
+CacheEntry.__doc__ = """Response stored in a cache.
+
+status - HTTP status code
+headers - dict of the response headers
+content - body of the response as bytes
+stored_at - time.time() the entry was stored or last revalidated
+"""
+
+
+def cache_key(path, params, credential=None):
+    """Key of a GET request for path with the query params.
+
+    The query is normalized so that the same request built from
+    differently ordered dicts maps to the same key. Requests made with
+    different credentials (e.g. the Authorization header) get different
+    keys, so that a cache shared by the clients of several accounts never
+    serves the responses of one to another. Only a digest of the
+    credential is part of the key.
+    """
+    key = path
+    if params:
+        query = sorted((str(k), str(v)) for k, v in params.items()
+                       if v is not None)
+        key += '?' + urlencode(query)
+    if credential:
+        if not isinstance(credential, bytes):
+            credential = credential.encode('utf-8')
+        # After the query, where the path parsing of _affected ignores it
+        key += '%s#%s' % ('' if '?' in key else '?',
+                          hashlib.sha256(credential).hexdigest()[:32])
+    return key
+
+
+def _resource(path):
+    """Kind of the resources at path, e.g. 'sources' for /sources/<id>."""
+    resource = path.strip('/').split('/', 1)[0]
+    # auto_subscriptions create subscriptions
+    return resource.rsplit('_', 1)[-1]
+
+
+def _segments(key):
+    """First and last segments of the path of key, the parts of it
+    _affected() looks at.
+    """
+    key_path = key.split('?', 1)[0].rstrip('/')
+    return key_path.strip('/').split('/', 1)[0], key_path.rsplit('/', 1)[-1]
+
+
+def _affected(key, path, resource):
+    key_path = key.split('?', 1)[0].rstrip('/')
+    if key_path == path or key_path.startswith(path + '/'):
+        return True
+    # List endpoints, e.g. /users/me/sources/ for a change to /sources/<id>
+    return key_path.rsplit('/', 1)[-1] == resource
+
+
+class ResponseCache(object):
+    """In-memory cache of GET responses for Pipedream clients.
+
+    Entries are fresh for ttl seconds. Stale entries of responses which
+    had an ETag are kept and revalidated with If-None-Match, so that an
+    unchanged resource costs a 304 without a body. The least recently
+    used entries are evicted once the bodies take more than max_bytes.
+
+    A successful non-GET request invalidates the entries of the resource
+    it changed, of everything below it and of the lists of the same kind
+    of resources.
+
+    ResponseCache is thread safe.
+
+        z = Pipedream(token, cache=ResponseCache(ttl=300))
+    """
+
+    def __init__(self, ttl=60, max_bytes=16 * 1024 * 1024):
+        """
+        Parameters:
+        ttl - Seconds an entry is used without asking the API.
+            Defaults to 60.
+        max_bytes - Total size of the bodies kept. Defaults to 16 MiB.
+        """
+        if ttl < 0 or max_bytes < 0:
+            raise ValueError("ttl and max_bytes must be non-negative")
+
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        # Keys by the first and by the last segment of their path, so that
+        # invalidate() only looks at the keys it may affect
+        self._by_first = {}
+        self._by_last = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Total size in bytes of the bodies in the cache."""
+        return self._size
+
+    def fresh(self, entry):
+        """Whether entry can be used without revalidation."""
+        return time.time() - entry.stored_at < self.ttl
+
+    def get(self, key):
+        """Return the entry stored for key, fresh or not, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._remove(key)
+            size = len(entry.content)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += size
+            first, last = _segments(key)
+            self._by_first.setdefault(first, set()).add(key)
+            self._by_last.setdefault(last, set()).add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def touch(self, key):
+        """Mark the entry of key as fresh again, e.g. after a 304."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(stored_at=time.time())
+                self._entries.move_to_end(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate(self, path):
+        """Drop the entries affected by a change to the resource at path."""
+        path = path.split('?', 1)[0].rstrip('/')
+        resource = _resource(path)
+        with self._lock:
+            if path:
+                # Keys below path share its first segment
+                candidates = (self._by_first.get(_segments(path)[0], set()) |
+                              self._by_last.get(resource, set()))
+            else:
+                candidates = list(self._entries)
+            for key in [k for k in candidates
+                        if _affected(k, path, resource)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._by_first.clear()
+            self._by_last.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.content)
+            first, last = _segments(key)
+            for index, segment in ((self._by_first, first),
+                                   (self._by_last, last)):
+                keys = index[segment]
+                keys.discard(key)
+                if not keys:
+                    del index[segment]
+
+
+class DiskCache(object):
+    """Persistent cache of GET responses in a local directory.
+
+    Meant for large, essentially immutable resources such as component
+    definitions, so short-lived processes don't fetch them again on every
+    start. Mount it on the paths it should serve:
+
+        registry = DiskCache('~/.cache/pipedreamer')
+        z.mount_cache('/components/', registry)
+
+    Every entry is a single file named after the SHA-256 of its key,
+    written to a temporary file and renamed into place. Any number of
+    processes can read and write the same directory at once: a reader
+    sees either the old or the new version of an entry, never a partial
+    one. Empty marker files under index/ list the entries by the first
+    and the last segment of their path, so that invalidate() only reads
+    the entries a change may affect.
+
+    Bodies don't have to be read or parsed at once, open() maps an entry
+    into memory and returns a zero-copy view of its body.
+    """
+
+    def __init__(self, directory, ttl=None):
+        """
+        Parameters:
+        directory - Directory holding the entries, created if needed.
+        ttl - Seconds an entry is used without asking the API. Defaults to
+            None (entries never expire).
+        """
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.ttl = ttl
+        self._index = os.path.join(self.directory, 'index')
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.isdir(self._index):
+            # Directory written by a version without the index
+            self._reindex()
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _keys(self):
+        for root, dirs, names in os.walk(self.directory):
+            if root == self.directory and 'index' in dirs:
+                dirs.remove('index')
+            for name in names:
+                if not name.endswith('.tmp'):
+                    yield os.path.join(root, name)
+
+    def _markers(self, key, filename):
+        """Paths of the index markers of the entry of key."""
+        first, last = _segments(key)
+        name = os.path.basename(filename)
+        return [os.path.join(self._index, kind, quote(segment, safe='') or
+                             '%', name)
+                for kind, segment in (('first', first), ('last', last))]
+
+    def _mark(self, key, filename):
+        for marker in self._markers(key, filename):
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            open(marker, 'ab').close()
+
+    def _unlink(self, key, filename):
+        for name in [filename] + self._markers(key, filename):
+            try:
+                os.unlink(name)
+            except OSError:
+                pass
+
+    def _reindex(self):
+        for filename in list(self._keys()):
+            mapped = self._map(filename)
+            if mapped is not None:
+                mapped[0].close()
+                self._mark(mapped[1]['key'], filename)
+        os.makedirs(self._index, exist_ok=True)
+
+    def _map(self, filename):
+        """Map filename into memory, returning the mapping, the decoded
+        header and the offset of the body, or None if it doesn't exist.
+        """
+        try:
+            f = open(filename, 'rb')
+        except (IOError, OSError):
+            return None
+        with f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                return None
+        offset = mm.find(b'\n')
+        if offset < 0:
+            mm.close()
+            return None
+        header = json.loads(mm[:offset].decode('utf-8'))
+        return mm, header, offset + 1
+
+    def fresh(self, entry):
+        if self.ttl is None:
+            return True
+        return time.time() - entry.stored_at < self.ttl
+
+    def get(self, key):
+        mapped = self._map(self._path(key))
+        if mapped is None:
+            return None
+        mm, header, offset = mapped
+        try:
+            if header['key'] != key:
+                return None
+            return CacheEntry(header['status'], header['headers'],
+                              mm[offset:], header['stored_at'])
+        finally:
+            mm.close()
+
+    def open(self, key):
+        """Return a read-only memoryview of the body stored for key, or
+        None. The file is only read as the view is accessed.
+        """
+        mapped = self._map(self._path(key))
+        if mapped is None:
+            return None
+        mm, header, offset = mapped
+        if header['key'] != key:
+            mm.close()
+            return None
+        return memoryview(mm)[offset:]
+
+    def set(self, key, entry):
+        filename = self._path(key)
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+
+        header = json.dumps({
+            'key': key,
+            'status': entry.status,
+            'headers': dict(entry.headers),
+            'stored_at': entry.stored_at,
+        }).encode('utf-8')
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(b'\n')
+                f.write(entry.content)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._mark(key, filename)
+
+    def touch(self, key):
+        entry = self.get(key)
+        if entry is not None:
+            self.set(key, entry._replace(stored_at=time.time()))
+
+    def delete(self, key):
+        self._unlink(key, self._path(key))
+
+    def invalidate(self, path):
+        """Drop the entries affected by a change to the resource at path.
+
+        Only the entries listed in the index under the first segment of
+        path or under its kind of resource are read.
+        """
+        path = path.split('?', 1)[0].rstrip('/')
+        resource = _resource(path)
+        if not path:
+            filenames = set(self._keys())
+        else:
+            filenames = set()
+            for kind, segment in (('first', _segments(path)[0]),
+                                  ('last', resource)):
+                directory = os.path.join(self._index, kind,
+                                         quote(segment, safe='') or '%')
+                try:
+                    names = os.listdir(directory)
+                except OSError:
+                    continue
+                filenames.update(os.path.join(self.directory, name[:2], name)
+                                 for name in names)
+
+        for filename in filenames:
+            mapped = self._map(filename)
+            if mapped is None:
+                continue
+            mm, header, _ = mapped
+            mm.close()
+            if _affected(header['key'], path, resource):
+                self._unlink(header['key'], filename)
+
+    def clear(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.tmp'):
+                    try:
+                        os.unlink(os.path.join(root, name))
+                    except OSError:
+                        pass
@@ -0,0 +1,103 @@
+import json
+
+
+class JSONCodec(object):
+    """Standard library JSON encoding and decoding.
+
+    Codecs encode straight to and decode straight from bytes, which is
+    what goes over the wire, so no intermediate str is needed with the
+    faster backends.
+    """
+
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON codec backed by orjson.
+
+    Falls back to the standard library for what orjson refuses to encode,
+    such as non-str dict keys. Note that orjson decodes integers which
+    don't fit in 64 bits as floats.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj)
+        except TypeError:
+            return super(OrjsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return super(OrjsonCodec, self).loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """JSON codec backed by ujson, falling back to the standard library
+    for what ujson refuses.
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj):
+        try:
+            return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+        except (TypeError, OverflowError):
+            return super(UjsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        try:
+            return self._ujson.loads(data)
+        except ValueError:
+            return super(UjsonCodec, self).loads(data)
+
+
+CODECS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+}
+
+
+def get_codec(codec='auto'):
+    """Return a JSON codec.
+
+    Parameters:
+    codec - 'auto' for the fastest installed backend (orjson, then ujson,
+        then the standard library), one of the names in CODECS, or a codec
+        instance which is returned as is.
+    """
+    if not isinstance(codec, str):
+        return codec
+
+    if codec == 'auto':
+        for name in ('orjson', 'ujson'):
+            try:
+                return CODECS[name]()
+            except ImportError:
+                pass
+        return JSONCodec()
+
+    try:
+        return CODECS[codec]()
+    except KeyError:
+        raise ValueError("Unknown JSON codec: %s" % codec)
@@ -0,0 +1,274 @@
+"""Export the event summaries of sources and workflows to files.
+
+    pipedream-export --output events/ [--source ID]... [--workflow ID]...
+                     [--org ID] [--gzip] [--partition day]
+
+Without --source, every source of the user (or of the organization given
+with --org) is exported. The token is read from --token or from the
+PIPEDREAM_API_KEY environment variable.
+"""
+import argparse
+import binascii
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+from .pipedreamer import Pipedream, _check_client
+from .sync import EventSync, SqliteCheckpointStore
+
+PARTITIONS = {
+    'day': '%Y-%m-%d',
+    'hour': '%Y-%m-%dT%H',
+    None: None,
+}
+
+
+class EventExporter(object):
+    """Export the event summaries of sources and workflows to partitioned
+    newline-delimited JSON files, optionally gzip compressed.
+
+    Events are laid out as
+    <directory>/<source|workflow>=<id>/date=<partition>/part-*.ndjson[.gz],
+    partitioned by the UTC date (or hour) they were indexed at. Encoded
+    events are buffered in memory and every flush writes each partition's
+    buffer to a new file in one go, through a temporary file renamed into
+    place, so part files are always complete.
+
+    Exports are incremental, as with EventSync: a checkpoint is kept per
+    source and workflow in store, and only advanced once the events it
+    covers have been written. A failed export resumes from the last flush
+    instead of restarting. Events written after that flush but before the
+    failure are exported again (at-least-once delivery).
+
+    Example:
+        exporter = EventExporter(z, 'events/', compression='gzip')
+        for r in exporter.export(concurrency=8):
+            if r.error:
+                print('export of %s %s failed: %s' % (r.item + (r.error, )))
+    """
+
+    def __init__(self, client, directory, store=None, compression=None,
+                 partition='day', buffer_size=8 * 1024 * 1024, limit=100):
+        """
+        Parameters:
+        client - Pipedream client. Size its pool_maxsize for the
+            concurrency of export().
+        directory - Directory the files are written to, created if needed.
+        store - Checkpoint store, see pipedreamer.sync. Defaults to a
+            SqliteCheckpointStore in directory.
+        compression - None or 'gzip'.
+        partition - 'day' (default), 'hour' or None for a single partition.
+        buffer_size - Bytes of encoded events buffered per source or
+            workflow before writing them out. Defaults to 8 MiB.
+        limit - Page size to request. Defaults to 100.
+        """
+        if compression not in (None, 'gzip'):
+            raise ValueError("Unsupported compression: %s" % compression)
+        if partition not in PARTITIONS:
+            raise ValueError("Unsupported partition: %s" % partition)
+
+        _check_client(client, "EventExporter")
+        self.client = client
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        os.makedirs(self.directory, exist_ok=True)
+        if store is None:
+            store = SqliteCheckpointStore(
+                os.path.join(self.directory, 'checkpoints.db'))
+        self.store = store
+        self.compression = compression
+        self.partition = partition
+        self.buffer_size = buffer_size
+        self.limit = limit
+
+    def export(self, sources=None, workflows=(), org_id=None,
+               concurrency=4):
+        """Export sources and workflows concurrently.
+
+        Parameters:
+        sources - Ids of the sources to export. Defaults to None, every
+            source of the user or of org_id.
+        workflows - Ids of the workflows to export.
+        org_id - Organization whose sources to export when sources is
+            None.
+        concurrency - Number of sources and workflows exported at once.
+            Defaults to 4.
+
+        Returns: generator of MapResult(item, result, error) in completion
+            order, where item is ('source', id) or ('workflow', id) and
+            result the number of events exported.
+        """
+        if sources is None:
+            if org_id is None:
+                listed = self.client.iter_items(
+                    self.client.users_me_sources_)
+            else:
+                listed = self.client.iter_items(
+                    self.client.orgs_sources_list, org_id)
+            sources = (source['id'] for source in listed)
+
+        targets = ([('source', id) for id in sources] +
+                   [('workflow', id) for id in workflows])
+        return self.client.map(self.export_one, targets,
+                               concurrency=concurrency, ordered=False)
+
+    def export_source(self, source_id):
+        """Export the new events of a source. Returns their number."""
+        return self.export_one(('source', source_id))
+
+    def export_workflow(self, workflow_id):
+        """Export the new events of a workflow. Returns their number."""
+        return self.export_one(('workflow', workflow_id))
+
+    def export_one(self, target):
+        kind, id = target
+        writer = _PartitionWriter(self, kind, id)
+        sync = EventSync(self.client, writer, limit=self.limit)
+        if kind == 'source':
+            events = sync.source_events(id, expand='event')
+        else:
+            events = sync.workflow_events(id, expand='event')
+
+        count = 0
+        for event in events:
+            writer.write(event)
+            count += 1
+        return count
+
+
+class _PartitionWriter(object):
+    """Buffers the events of one source or workflow and writes them out
+    to part files.
+
+    Acts as the checkpoint store of its EventSync: checkpoints are held
+    back until the events they cover have been written.
+    """
+
+    def __init__(self, exporter, kind, id):
+        self.exporter = exporter
+        self.store = exporter.store
+        self.dumps = exporter.client.json_codec.dumps
+        self.directory = os.path.join(exporter.directory,
+                                      '%s=%s' % (kind, id))
+        self.buffers = {}
+        self.size = 0
+        self.files = 0
+        self.checkpoint = None
+        # Distinguishes the files of successive and concurrent runs
+        self.run = '%s-%s' % (time.strftime('%Y%m%dT%H%M%S', time.gmtime()),
+                              binascii.hexlify(os.urandom(4)).decode())
+
+    def load(self, name):
+        return self.store.load(name)
+
+    def save(self, name, checkpoint):
+        self.checkpoint = (name, checkpoint)
+        # The final checkpoint of a sync has no pending cursor
+        if self.size >= self.exporter.buffer_size or \
+                'pending' not in checkpoint:
+            self.flush()
+
+    def write(self, event):
+        key = self._partition(event)
+        line = self.dumps(event) + b'\n'
+        self.buffers.setdefault(key, []).append(line)
+        self.size += len(line)
+
+    def flush(self):
+        for key, lines in sorted(self.buffers.items()):
+            self._write_file(key, b''.join(lines))
+        self.buffers = {}
+        self.size = 0
+        if self.checkpoint is not None:
+            self.store.save(*self.checkpoint)
+            self.checkpoint = None
+
+    def _partition(self, event):
+        fmt = PARTITIONS[self.exporter.partition]
+        if fmt is None:
+            return 'all'
+        indexed_at = (event.get('indexed_at_ms') or 0) / 1000.0
+        return time.strftime(fmt, time.gmtime(indexed_at))
+
+    def _write_file(self, key, data):
+        directory = os.path.join(self.directory, 'date=%s' % key)
+        os.makedirs(directory, exist_ok=True)
+
+        name = 'part-%s-%05d.ndjson' % (self.run, self.files)
+        if self.exporter.compression == 'gzip':
+            name += '.gz'
+            data = gzip.compress(data)
+        self.files += 1
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, os.path.join(directory, name))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('\n', 2)[2])
+    parser.add_argument('--output', '-o', required=True,
+                        help='directory to write the files to')
+    parser.add_argument('--token', default=os.environ.get('PIPEDREAM_API_KEY'),
+                        help='API key (default: $PIPEDREAM_API_KEY)')
+    parser.add_argument('--source', action='append', dest='sources',
+                        help='source to export, repeatable')
+    parser.add_argument('--workflow', action='append', dest='workflows',
+                        default=[], help='workflow to export, repeatable')
+    parser.add_argument('--org', help='export the sources of this '
+                        'organization instead of the user\'s')
+    parser.add_argument('--checkpoints', help='SQLite checkpoint database '
+                        '(default: OUTPUT/checkpoints.db)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--gzip', action='store_true',
+                        help='compress the files')
+    parser.add_argument('--partition', choices=['day', 'hour', 'none'],
+                        default='day')
+    parser.add_argument('--limit', type=int, default=100,
+                        help='page size (default: 100)')
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if not args.token:
+        parser.error('an API key is required, use --token or '
+                     'PIPEDREAM_API_KEY')
+
+    client_kwargs = {'pool_maxsize': max(10, args.concurrency)}
+    if args.base_url:
+        client_kwargs['base_url'] = args.base_url
+    client = Pipedream(args.token, **client_kwargs)
+
+    store = None
+    if args.checkpoints:
+        store = SqliteCheckpointStore(args.checkpoints)
+    exporter = EventExporter(
+        client, args.output, store=store,
+        compression='gzip' if args.gzip else None,
+        partition=None if args.partition == 'none' else args.partition,
+        limit=args.limit)
+
+    failed = 0
+    for r in exporter.export(args.sources, args.workflows, args.org,
+                             args.concurrency):
+        if r.error is None:
+            print('%s %s: %d events' % (r.item + (r.result, )))
+        else:
+            failed += 1
+            print('%s %s: failed: %s' % (r.item + (r.error, )),
+                  file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
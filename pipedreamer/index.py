@@ -0,0 +1,250 @@
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .pipedreamer import _check_client
+from .reconcile import Subscription, list_records, subscription
+
+
+class _Snapshot(object):
+    """Indexes built from one listing of the sources and subscriptions."""
+
+    def __init__(self):
+        self.sources = {}
+        self.source_names = {}
+        self.subscriptions = {}
+        self.by_key = {}
+        self.by_emitter = {}
+        self.by_listener = {}
+        self.loaded_at = time.monotonic()
+
+    def add_source(self, source):
+        old = self.sources.get(source['id'])
+        if old is not None and self.source_names.get(old.get('name')) is old:
+            del self.source_names[old['name']]
+        self.sources[source['id']] = source
+        if source.get('name') is not None:
+            self.source_names[source['name']] = source
+
+    def remove_source(self, id):
+        old = self.sources.pop(id, None)
+        if old is not None and self.source_names.get(old.get('name')) is old:
+            del self.source_names[old['name']]
+
+    def add_subscription(self, record):
+        key = subscription(record)
+        self.remove_subscription(key)
+        record = dict(record, event_name=key.event_name)
+        self.by_key[key] = record
+        if record.get('id') is not None:
+            self.subscriptions[record['id']] = record
+        # Tuples are replaced, not modified, for lock free readers
+        self.by_emitter[key.emitter_id] = \
+            self.by_emitter.get(key.emitter_id, ()) + (record, )
+        self.by_listener[key.listener_id] = \
+            self.by_listener.get(key.listener_id, ()) + (record, )
+
+    def remove_subscription(self, key):
+        record = self.by_key.pop(key, None)
+        if record is None:
+            return
+        self.subscriptions.pop(record.get('id'), None)
+        for index, value in ((self.by_emitter, key.emitter_id),
+                             (self.by_listener, key.listener_id)):
+            remaining = tuple(r for r in index.get(value, ())
+                              if r is not record)
+            if remaining:
+                index[value] = remaining
+            else:
+                index.pop(value, None)
+
+
+class ResourceIndex(object):
+    """In memory index of the sources and subscriptions of a client.
+
+    Looks sources up by id and name and subscriptions by id, emitter_id,
+    listener_id or all three, with dict lookups instead of scanning the
+    results of users_me_sources_() and users_me_subscriptions().
+
+    The index is loaded on the first lookup and reloaded, in the thread
+    making the lookup, once it is older than refresh_interval. It also
+    follows the changes made through the client (source_update,
+    source_delete, sources__create, subscription_create and
+    subscriptions_delete) as they succeed, through an after_response hook.
+    Changes made elsewhere show up with the next reload.
+
+    Lookups don't lock and are safe from any thread. Returned records are
+    the dicts received from the API, don't modify them.
+
+        index = ResourceIndex(z, refresh_interval=300)
+        source = index.source_by_name('orders')
+        for s in index.subscriptions_by_emitter(source['id']):
+            ...
+    """
+
+    def __init__(self, client, refresh_interval=None, org_id=None):
+        """
+        Parameters:
+        client - Pipedream client the index is loaded from and follows.
+        refresh_interval - Seconds after which the index is reloaded on
+            the next lookup. Defaults to None (never, see refresh()).
+        org_id - Index the sources and subscriptions of this organization
+            instead of the user's.
+        """
+        _check_client(client, "ResourceIndex")
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.org_id = org_id
+        self._snapshot = None
+        # Held by the thread (re)loading the index
+        self._loading = threading.Lock()
+        # Held while modifying the snapshot
+        self._lock = threading.Lock()
+        client.add_hook('after_response', self.after_response)
+
+    def detach(self):
+        """Stop following the changes made through the client."""
+        self.client.remove_hook('after_response', self.after_response)
+
+    def refresh(self):
+        """Reload the sources and subscriptions from the API."""
+        with self._loading:
+            self._load()
+
+    def _load(self):
+        snapshot = _Snapshot()
+        if self.org_id is None:
+            sources = list_records(self.client, 'users_me_sources_')
+            subscriptions = list_records(self.client,
+                                         'users_me_subscriptions')
+        else:
+            sources = list_records(self.client, 'orgs_sources_list',
+                                   self.org_id)
+            subscriptions = list_records(self.client,
+                                         'orgs_subscriptions_list',
+                                         self.org_id)
+        for source in sources:
+            snapshot.add_source(source)
+        for record in subscriptions:
+            snapshot.add_subscription(record)
+        with self._lock:
+            self._snapshot = snapshot
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._loading:
+                if self._snapshot is None:
+                    self._load()
+            return self._snapshot
+        if self.refresh_interval is not None and \
+                time.monotonic() - snapshot.loaded_at > self.refresh_interval:
+            # One thread reloads, the others keep using the old snapshot
+            if self._loading.acquire(False):
+                try:
+                    if self._snapshot is snapshot:
+                        self._load()
+                finally:
+                    self._loading.release()
+            return self._snapshot
+        return snapshot
+
+    def source(self, id):
+        """Return the source of id or None."""
+        return self._current().sources.get(id)
+
+    def source_by_name(self, name):
+        """Return the source named name or None."""
+        return self._current().source_names.get(name)
+
+    def sources(self):
+        """Return the list of the sources."""
+        return list(self._current().sources.values())
+
+    def subscription(self, id):
+        """Return the subscription of id or None."""
+        return self._current().subscriptions.get(id)
+
+    def subscription_for(self, emitter_id, listener_id, event_name=None):
+        """Return the subscription of listener_id to the event_name events
+        of emitter_id, or None.
+        """
+        return self._current().by_key.get(
+            subscription((emitter_id, listener_id, event_name)))
+
+    def subscriptions_by_emitter(self, emitter_id):
+        """Return the tuple of the subscriptions to emitter_id."""
+        return self._current().by_emitter.get(emitter_id, ())
+
+    def subscriptions_by_listener(self, listener_id):
+        """Return the tuple of the subscriptions of listener_id."""
+        return self._current().by_listener.get(listener_id, ())
+
+    def subscriptions(self):
+        """Return the list of the subscriptions."""
+        return list(self._current().by_key.values())
+
+    def after_response(self, method, url, response, **kwargs):
+        """Hook applying the changes made through the client."""
+        if response is None or not 200 <= response.status_code < 300 or \
+                method == 'GET' or self._snapshot is None:
+            return
+        base_url = self.client.base_url
+        if not url.startswith(base_url):
+            return
+        path = url[len(base_url):].rstrip('/').split('/')[1:]
+
+        if path[:1] == ['sources']:
+            if len(path) == 1 and method == 'POST':
+                self._update_source(None, response)
+            elif len(path) == 2 and method == 'PUT':
+                self._update_source(path[1], response)
+            elif len(path) == 2 and method == 'DELETE':
+                with self._lock:
+                    self._snapshot.remove_source(path[1])
+        elif path == ['subscriptions'] and method in ('POST', 'DELETE'):
+            query = parse_qs(urlsplit(response.request.url).query)
+            record = dict((k, v[0]) for k, v in query.items()
+                          if k in Subscription._fields)
+            if 'emitter_id' not in record or 'listener_id' not in record:
+                return
+            with self._lock:
+                if method == 'POST':
+                    data = self._decode(response.content)
+                    if isinstance(data, dict):
+                        record.update(data)
+                    self._snapshot.add_subscription(record)
+                else:
+                    self._snapshot.remove_subscription(
+                        subscription(record))
+
+    def _update_source(self, id, response):
+        """Apply a created or updated source: the one in the response, or
+        the update sent merged into the indexed one.
+        """
+        source = self._decode(response.content)
+        if not isinstance(source, dict) or 'id' not in source:
+            if id is None:
+                return
+            update = self._decode(getattr(response.request, 'body', None))
+            if not isinstance(update, dict):
+                return
+            with self._lock:
+                old = self._snapshot.sources.get(id)
+                if old is not None:
+                    self._snapshot.add_source(dict(old, **update))
+            return
+        with self._lock:
+            self._snapshot.add_source(source)
+
+    def _decode(self, body):
+        """Return the record of a JSON body, None if there is none."""
+        if not body:
+            return None
+        try:
+            data = self.client.json_codec.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and isinstance(data.get('data'), dict):
+            return data['data']
+        return data
@@ -0,0 +1,134 @@
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JSONArrayStream(object):
+    """Incrementally decode the array under one key of a JSON object.
+
+    Iterating yields the elements of the array as soon as each of them has
+    been received, without holding the rest of the document. The other
+    members of the object are decoded as a whole and available in rest
+    once the iteration is over.
+
+    Example:
+        stream = JSONArrayStream(response.iter_content(65536), 'data')
+        for event in stream:
+            handle(event)
+        page_info = stream.rest.get('page_info')
+    """
+
+    def __init__(self, chunks, key='data', decoder=None):
+        """
+        Parameters:
+        chunks - Iterable of bytes (or str) making up the document.
+        key - Key of the array to stream. Defaults to 'data'.
+        decoder - json.JSONDecoder to decode values with.
+        """
+        self.key = key
+        self.rest = {}
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = decoder or json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            name = self._value()
+            if not isinstance(name, str):
+                raise ValueError("Expected an object key at %d" % self._pos)
+            self._expect(':')
+
+            if name == self.key and self._peek() == '[':
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._separator(']'):
+                            break
+            else:
+                self.rest[name] = self._value()
+
+            if self._separator('}'):
+                return
+
+    def _fill(self):
+        """Read the next chunk. Returns False at the end of the document."""
+        if self._eof:
+            return False
+        if self._pos:
+            # Drop what has been decoded already
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buf += self._utf8.decode(b'', final=True)
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        self._buf += chunk
+        return True
+
+    def _peek(self):
+        """Return the next non-whitespace character."""
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError("Expected %r at %d" % (char, self._pos))
+        self._pos += 1
+
+    def _separator(self, close):
+        """Consume a ',' or close. Returns True for close."""
+        char = self._peek()
+        self._pos += 1
+        if char == close:
+            return True
+        if char != ',':
+            raise ValueError("Expected ',' or %r at %d" % (close, self._pos))
+        return False
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                value, end = None, None
+            # A number or literal at the very end of the buffer may be
+            # cut short, only accept it once something follows.
+            if end is not None and (end < len(self._buf) or self._eof):
+                self._pos = end
+                return value
+            # Read until the buffer doubles so long values aren't decoded
+            # from the start after every small chunk.
+            target = 2 * (len(self._buf) - self._pos)
+            while True:
+                if not self._fill():
+                    if end is None:
+                        # Raise the decoder's own error
+                        self._decoder.raw_decode(self._buf, self._pos)
+                    break
+                if len(self._buf) - self._pos >= target:
+                    break
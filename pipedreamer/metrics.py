@@ -0,0 +1,306 @@
+import bisect
+import re
+import threading
+from urllib.parse import urlsplit
+
+from .pipedreamer_api import ENDPOINTS
+
+# Path segments holding ids, e.g. dc_BVu1Ke or 12345
+_ID = re.compile(r'^(?:[a-z]{1,4}_[A-Za-z0-9]{4,}|\d+)$')
+# Path segments of the API endpoints, never ids even when they look like
+# one (auto_subscriptions)
+_SEGMENTS = frozenset(segment for _, path, _, _ in ENDPOINTS.values()
+                      for segment in path.split('/')
+                      if not segment.startswith('{'))
+_VERSION = re.compile(r'^/v\d+(?=/)')
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+
+def endpoint_name(url):
+    """Name of the endpoint of url: its path without the API version and
+    with ids replaced by {id}, e.g. /sources/{id}/event_summaries.
+
+    Keeps the number of label values of the metrics bounded.
+    """
+    path = _VERSION.sub('', urlsplit(url).path)
+    return '/'.join('{id}' if segment not in _SEGMENTS and
+                    _ID.match(segment) else segment
+                    for segment in path.split('/'))
+
+
+class Histogram(object):
+    """Histogram with fixed buckets, as exported to Prometheus."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One more for the values above the last bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Return [(upper bound, count of values <= it)], ending with
+        (float('inf'), count).
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'), ),
+                                self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate the q quantile (0 <= q <= 1) by linear interpolation
+        within its bucket, as Prometheus' histogram_quantile does.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        # Above the last bucket, nothing better to say than its bound
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': [['+Inf' if b == float('inf') else b, c]
+                        for b, c in self.cumulative()],
+        }
+
+
+class _EndpointStats(object):
+    __slots__ = ('statuses', 'retries', 'bytes_in', 'bytes_out', 'duration',
+                 'decode')
+
+    def __init__(self, buckets):
+        self.statuses = {}
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.duration = Histogram(buckets)
+        self.decode = Histogram(buckets)
+
+
+class MetricsCollector(object):
+    """Request metrics of Pipedream clients, collected through their hooks.
+
+    Records per endpoint (method and endpoint_name() of the URL) the
+    latency of every attempt, the responses by status, retries, bytes
+    sent and received and the time spent decoding bodies, as well as the
+    time spent sleeping between retries and waiting for rate limits.
+
+    One collector can be attached to any number of clients and is thread
+    safe. A client without hooks pays a single test per request.
+
+        metrics = MetricsCollector()
+        z = metrics.attach(Pipedream(token))
+        ...
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, endpoint=endpoint_name,
+                 prefix='pipedream'):
+        """
+        Parameters:
+        buckets - Upper bounds in seconds of the histogram buckets.
+            Defaults to DEFAULT_BUCKETS.
+        endpoint - Function returning the endpoint label of a URL.
+            Defaults to endpoint_name.
+        prefix - Prefix of the Prometheus metric names.
+        """
+        self.buckets = tuple(buckets)
+        self.endpoint = endpoint
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self._sleeps = {}
+
+    def hooks(self):
+        """Return the hooks of the collector as a dict for the hooks
+        argument of Pipedream.
+        """
+        return {
+            'after_response': self.after_response,
+            'on_retry': self.on_retry,
+            'on_sleep': self.on_sleep,
+            'on_decode': self.on_decode,
+        }
+
+    def attach(self, client):
+        """Register the hooks of the collector on client and return it."""
+        for event, hook in self.hooks().items():
+            client.add_hook(event, hook)
+        return client
+
+    def detach(self, client):
+        for event, hook in self.hooks().items():
+            client.remove_hook(event, hook)
+        return client
+
+    def _stats(self, method, url):
+        key = (method, self.endpoint(url))
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = _EndpointStats(self.buckets)
+        return stats
+
+    def after_response(self, method, url, response, error, elapsed,
+                       request_size=None, response_size=None, **kwargs):
+        if response is not None:
+            status = str(response.status_code)
+        else:
+            status = type(error).__name__
+        with self._lock:
+            stats = self._stats(method, url)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.duration.observe(elapsed)
+            if request_size:
+                stats.bytes_out += request_size
+            if response_size:
+                stats.bytes_in += response_size
+
+    def on_retry(self, method, url, **kwargs):
+        with self._lock:
+            self._stats(method, url).retries += 1
+
+    def on_sleep(self, reason, seconds, **kwargs):
+        with self._lock:
+            count, total = self._sleeps.get(reason, (0, 0.0))
+            self._sleeps[reason] = (count + 1, total + seconds)
+
+    def on_decode(self, method, url, elapsed, **kwargs):
+        with self._lock:
+            self._stats(method, url).decode.observe(elapsed)
+
+    def to_dict(self):
+        """Return the metrics as a JSON serializable dict:
+
+            {'endpoints': {'GET /sources/{id}/event_summaries': {
+                'requests': ..., 'statuses': {'200': ...}, 'retries': ...,
+                'bytes_in': ..., 'bytes_out': ...,
+                'duration': {'count', 'sum', 'p50', 'p90', 'p99', 'buckets'},
+                'decode': {...}}},
+             'sleeps': {'retry': {'count': ..., 'seconds': ...}}}
+        """
+        with self._lock:
+            endpoints = {}
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                endpoints['%s %s' % (method, endpoint)] = {
+                    'requests': sum(stats.statuses.values()),
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'bytes_in': stats.bytes_in,
+                    'bytes_out': stats.bytes_out,
+                    'duration': stats.duration.to_dict(),
+                    'decode': stats.decode.to_dict(),
+                }
+            sleeps = dict((reason, {'count': count, 'seconds': seconds})
+                          for reason, (count, seconds)
+                          in sorted(self._sleeps.items()))
+        return {'endpoints': endpoints, 'sleeps': sleeps}
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = []
+
+        def metric(name, kind, help):
+            lines.append('# HELP %s_%s %s' % (p, name, help))
+            lines.append('# TYPE %s_%s %s' % (p, name, kind))
+
+        def sample(name, labels, value):
+            lines.append('%s_%s{%s} %s' % (p, name, _labels(labels),
+                                           _value(value)))
+
+        def histogram(name, labels, hist):
+            for bound, count in hist.cumulative():
+                sample(name + '_bucket', labels + [('le', bound)], count)
+            sample(name + '_sum', labels, hist.sum)
+            sample(name + '_count', labels, hist.count)
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+            metric('request_duration_seconds', 'histogram',
+                   'Duration of API request attempts.')
+            for (method, endpoint), stats in endpoints:
+                histogram('request_duration_seconds',
+                          [('method', method), ('endpoint', endpoint)],
+                          stats.duration)
+
+            metric('requests_total', 'counter',
+                   'API request attempts by status code or error.')
+            for (method, endpoint), stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    sample('requests_total', [('method', method),
+                                              ('endpoint', endpoint),
+                                              ('status', status)], count)
+
+            for name, attr, help in (
+                    ('retries_total', 'retries', 'Retried API requests.'),
+                    ('request_bytes_total', 'bytes_out',
+                     'Bytes of request bodies sent.'),
+                    ('response_bytes_total', 'bytes_in',
+                     'Bytes of response bodies received.')):
+                metric(name, 'counter', help)
+                for (method, endpoint), stats in endpoints:
+                    sample(name, [('method', method), ('endpoint', endpoint)],
+                           getattr(stats, attr))
+
+            metric('decode_duration_seconds', 'histogram',
+                   'Duration of the decoding of response bodies.')
+            for (method, endpoint), stats in endpoints:
+                if stats.decode.count:
+                    histogram('decode_duration_seconds',
+                              [('method', method), ('endpoint', endpoint)],
+                              stats.decode)
+
+            metric('sleeps_total', 'counter',
+                   'Sleeps of the client by reason.')
+            for reason, (count, _) in sorted(self._sleeps.items()):
+                sample('sleeps_total', [('reason', reason)], count)
+            metric('sleep_seconds_total', 'counter',
+                   'Seconds slept by the client by reason.')
+            for reason, (_, seconds) in sorted(self._sleeps.items()):
+                sample('sleep_seconds_total', [('reason', reason)], seconds)
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    return ','.join('%s="%s"' % (name, _value(value).replace('\\', '\\\\')
+                                 .replace('"', '\\"').replace('\n', '\\n'))
+                    for name, value in labels)
+
+
+def _value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
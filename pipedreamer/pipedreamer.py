@@ -1,29 +1,37 @@
 import collections
 import copy
-import inspect
+import itertools
+import queue
+import random
 import sys
+import threading
 import time
+from collections.abc import Iterable, Sequence
+from concurrent import futures
 
 import requests
-import six
+from requests.structures import CaseInsensitiveDict
+
+from .cache import CacheEntry, cache_key
+from .codec import get_codec
+from .jsonstream import JSONArrayStream
+from .records import decode_page, record_type
+from .singleflight import SingleFlight
+from .transport import HTTPXTransport, RequestsTransport
+from .pipedreamer_api import PipedreamAPI
 
-if six.PY2:
-    from httplib import responses
-    from urlparse import urlsplit
-else:
-    from http.client import responses
-    from urllib.parse import urlsplit
+API_URL = 'https://api.pipedream.com/v1'
 
-# Compatability with Python 3.10
-try:
-    from collections.abc import Iterable
-except ImportError:
-    from collections import Iterable
+# Size of the reads of streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
 
-from .pipedreamer_api import PipedreamAPI
+# Events hooks can be registered for, see Pipedream.add_hook
+HOOK_EVENTS = ('before_request', 'after_response', 'on_retry', 'on_sleep',
+               'on_decode')
 
 
-def batch(sequence, callback, size=100, **kwargs):
+def batch(sequence, callback, size=100, concurrency=None, ordered=True,
+          **kwargs):
     """Helper to setup batch requests.
 
     There are endpoints which support updating multiple resources at once,
@@ -47,20 +55,237 @@ def batch(sequence, callback, size=100, **kwargs):
         job_ids = [job for job in
                    batch(orgs, add_organization_tag, tag='new_tag')]
 
+    sequence may also be any iterable, such as the generators of
+    iter_items(). It is consumed lazily, a chunk at a time, so batches
+    start before the last page has been fetched and memory is bounded by
+    the chunks in flight:
+
+        sources = z.iter_items(z.users_me_sources_)
+        for job in batch(sources, deactivate, size=50, concurrency=4):
+            ...
+
     Parameters:
-        sequence - any sequence you want to split
-        callback - function to call with slices of sequence,
-            its return value is yielded on each slice
+        sequence - any sequence or iterable you want to split
+        callback - function to call with slices of sequence (lists for
+            iterables which aren't sequences), its return value is
+            yielded on each slice
         size - size of chunks, combined with length of sequence determines
             how many times callback is called (defaults to 100)
+        concurrency - call callback from a pool of this many threads,
+            with at most 2 * concurrency chunks taken ahead of the results
+            being consumed. Defaults to None (one chunk at a time, in the
+            caller's thread). The first exception raised by callback is
+            re-raised and the chunks not started yet are dropped.
+        ordered - with concurrency, yield the results in the order of the
+            chunks (default) or as soon as they are available
         **kwargs - any additional keyword arguments are passed to callback
     """
-    batch_len, rem = divmod(len(sequence), size)
-    if rem > 0:
-        batch_len += 1
-    for i in range(batch_len):
-        offset = i * size
-        yield callback(sequence[offset:offset + size], **kwargs)
+    if size < 1:
+        raise ValueError("size must be a positive integer")
+
+    chunks = _chunks(sequence, size)
+    if not concurrency:
+        for chunk in chunks:
+            yield callback(chunk, **kwargs)
+        return
+
+    def _call(chunk):
+        return callback(chunk, **kwargs)
+
+    for _, future in _bounded_map(_call, chunks, concurrency, ordered):
+        yield future.result()
+
+
+def _chunks(iterable, size):
+    """Lazily split iterable into chunks of size items, slicing
+    sequences and collecting the items of other iterables into lists.
+    """
+    if isinstance(iterable, Sequence):
+        for offset in range(0, len(iterable), size):
+            yield iterable[offset:offset + size]
+        return
+
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prefetch(iterable, depth):
+    """Consume iterable in a background thread, keeping up to depth
+    items ready ahead of the caller.
+
+    Exceptions raised by iterable are re-raised in the caller at the
+    position they occurred. Closing the returned generator stops the
+    background thread after its current item.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+        except Exception:
+            _put((done, sys.exc_info()))
+        else:
+            _put((done, None))
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    thread = threading.Thread(target=_produce, name='pipedreamer-prefetch')
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            item, exc_info = items.get()
+            if item is done:
+                if exc_info is not None:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                return
+            yield item
+            item = None
+    finally:
+        stop.set()
+
+
+def _page_items(content):
+    """Return the data list of a paginated response or None if content
+    is not a page of results.
+    """
+    if (isinstance(content, dict) and
+            isinstance(content.get('page_info'), dict) and
+            isinstance(content.get('data'), list)):
+        return content['data']
+    return None
+
+
+def _check_client(client, user):
+    """Raise TypeError unless client is a Pipedream. The helpers built on
+    it (user names the one checking) send requests synchronously, which
+    an AsyncPipedream can't.
+    """
+    if not isinstance(client, Pipedream):
+        raise TypeError("%s requires a Pipedream client, not %s" %
+                        (user, type(client).__name__))
+
+
+def _next_cursor(content, cursor, seen):
+    """Find the cursor of the page following content.
+
+    Parameters:
+        content - decoded page just received
+        cursor - cursor content was requested with (None for the first page)
+        seen - number of items received before content
+
+    Returns: tuple of the number of items received including content and
+        the cursor to pass as the after parameter, or None if content is
+        the last page.
+    """
+    items = _page_items(content)
+    if items is None:
+        return seen, None
+    return _cursor_after(content['page_info'], len(items), cursor, seen)
+
+
+def _cursor_after(page_info, count, cursor, seen):
+    """Same as _next_cursor for a page of count items described by
+    page_info.
+    """
+    seen += count
+    total = page_info.get('total_count')
+    next_cursor = page_info.get('end_cursor')
+
+    if (not count or not next_cursor or next_cursor == cursor or
+            (total is not None and seen >= total)):
+        return seen, None
+    return seen, next_cursor
+
+
+def _retry_set(value):
+    """Validate a retry_on value and return it as a set."""
+    if value is None:
+        return set()
+
+    def _validate(v):
+        exc = ("retry_on must contain only non-2xx HTTP codes"
+               "or members of %s" % (ACCEPT_RETRIES, ))
+
+        if isinstance(v, type):
+            if not issubclass(v, ACCEPT_RETRIES):
+                raise ValueError(exc)
+        elif isinstance(v, int):
+            if 200 <= v < 300:
+                raise ValueError(exc)
+        else:
+            raise ValueError(exc)
+
+    if isinstance(value, Iterable):
+        for v in value:
+            _validate(v)
+        return set(value)
+    else:
+        _validate(value)
+        return set([value])
+
+
+def _cached_response(entry, url):
+    """Build a requests.Response from a cache entry."""
+    response = requests.Response()
+    response.status_code = entry.status
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response._content = entry.content
+    response.url = url
+    return response
+
+
+def _flight_key(url, params, headers, retry_policy):
+    """Key of a GET request for single-flight coalescing.
+
+    The retry policy is part of the key, by identity: a call with its own
+    retry_on or max_retries isn't answered by a request retried (or not)
+    under the client's policy.
+    """
+    if params:
+        params = tuple(sorted((str(k), str(v)) for k, v in params.items()
+                              if v is not None))
+    return url, params or (), tuple(sorted(headers.items())), retry_policy
+
+
+def _body_size(body):
+    """Size in bytes of a request or response body, None if unknown."""
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    return None
+
+
+def _check_response(response):
+    """Raise the proper PipedreamError if the response status is not in
+    the 200 range.
+    """
+    code = response.status_code
+    if not 200 <= code < 300 and code != 422:
+        if code == 401:
+            raise AuthenticationError(response.content, code, response)
+        elif code == 429:
+            raise RateLimitError(response.content, code, response)
+        else:
+            raise PipedreamError(response.content, code, response)
 
 
 class PipedreamError(Exception):
@@ -82,34 +307,236 @@ class RateLimitError(PipedreamError):
 
 ACCEPT_RETRIES = PipedreamError, requests.RequestException
 
+class RetryBudget(object):
+    """Cap on the share of a client's traffic that can be retries.
 
-class Pipedream(PipedreamAPI):
-    """ Python API Wrapper for Pipedream"""
+    Every request deposits ratio tokens into the budget and every retry
+    withdraws one, so that when a failure affects all requests, retries
+    add at most ratio more load instead of multiplying it by max_retries.
+    A reserve of min_retries tokens allows retrying while traffic is low.
 
-    def __init__(self, pipedreamer_oauth=None,
-                 headers=None, client_args=None, api_version=1,
-                 retry_on=None, max_retries=0):
+    RetryBudget is thread safe. Share one instance between all the
+    clients the budget should apply to.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10):
         """
-        Instantiates an instance of Pipedream. Takes optional parameters for
-        HTTP Basic Authentication
+        Parameters:
+        ratio - Retries allowed per request made. Defaults to 0.2.
+        min_retries - Retries allowed regardless of the traffic, also the
+            initial balance. Defaults to 10.
+        """
+        if ratio < 0 or min_retries < 0:
+            raise ValueError("ratio and min_retries must be non-negative")
+
+        self.ratio = float(ratio)
+        self.min_retries = float(min_retries)
+        self._lock = threading.Lock()
+        self._balance = self.min_retries
+        # Don't let a long quiet period of successes bank unlimited retries
+        self._max_balance = self.min_retries + 100 * self.ratio
+
+    def deposit(self):
+        """Record a request."""
+        with self._lock:
+            self._balance = min(self._max_balance,
+                                self._balance + self.ratio)
+
+    def withdraw(self):
+        """Take a retry from the budget. Returns False if it is exhausted."""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
 
+class RetryPolicy(object):
+    """Decides which failed requests are retried and how long to wait.
+
+    Retries wait for the Retry-After the API asked for or, if none,
+    back off exponentially with full jitter: the n-th retry sleeps a
+    random time between 0 and min(backoff_max, backoff * 2 ** (n - 1)).
+
+    By default only idempotent methods are retried, so that e.g. a POST
+    creating a source that timed out is not made twice. Rate limited
+    requests (429) were not processed and are retried whatever their
+    method.
+
+    Policies are immutable, use replace() to derive a modified one.
+
+    Example:
+        policy = RetryPolicy(retry_on=[429, 500, 502, 503,
+                                       requests.ConnectionError],
+                             max_retries=5, budget=RetryBudget(0.1))
+        z = Pipedream(token, retry_policy=policy)
+    """
+
+    IDEMPOTENT_METHODS = frozenset(
+        ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+    def __init__(self, retry_on=None, max_retries=0, backoff=0.5,
+                 backoff_max=30.0, methods=IDEMPOTENT_METHODS, budget=None):
+        """
         Parameters:
-        pipedreamer_token - use oauth token for authentication
-        headers - Pass headers in dict form. This will override default.
-        client_args - Pass arguments to http client in dict form.
-            {'allow_redirects': False, 'timeout': 2}
-            or a common one is to disable SSL certficate validation
-            {'verify': False}
-        retry_on - Specify any exceptions from ACCEPT_RETRIES or non-2xx
-            HTTP codes on which you want to retry request.
-            Note that calling Pipedream.call with get_all_pages=True can make
-            up to (max_retries + 1) * pages.
-            Defaults to empty set, but can be any iterable, exception or int,
-            which will become set with same values you provided.
-        max_retries - How many additional connections to make when
-            first one fails. No effect when retry_on evaluates to False.
-            Defaults to 0.
+        retry_on - Exceptions from ACCEPT_RETRIES or non-2xx HTTP codes on
+            which to retry, as for Pipedream.
+        max_retries - How many additional attempts to make when the first
+            one fails. Defaults to 0.
+        backoff - Upper bound in seconds of the first retry's sleep.
+            Defaults to 0.5.
+        backoff_max - Cap of the exponential backoff. Defaults to 30.
+        methods - HTTP methods which may be retried. Defaults to
+            IDEMPOTENT_METHODS.
+        budget - RetryBudget shared by the requests using this policy.
+            Defaults to None (no budget).
+        """
+        try:
+            max_retries = int(max_retries)
+            if max_retries < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError("max_retries must be non-negative integer")
+
+        if backoff < 0 or backoff_max < 0:
+            raise ValueError("backoff and backoff_max must be non-negative")
+
+        self.retry_on = frozenset(_retry_set(retry_on))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.methods = frozenset(m.upper() for m in methods)
+        self.budget = budget
+
+        self._retry_on_exc = tuple(
+            x for x in self.retry_on if isinstance(x, type))
+        self._retry_on_codes = frozenset(
+            x for x in self.retry_on if isinstance(x, int))
+
+    def replace(self, **kwargs):
+        """Return a copy of the policy with the given settings changed."""
+        settings = dict(retry_on=self.retry_on,
+                        max_retries=self.max_retries,
+                        backoff=self.backoff,
+                        backoff_max=self.backoff_max,
+                        methods=self.methods,
+                        budget=self.budget)
+        settings.update(kwargs)
+        return RetryPolicy(**settings)
+
+    def matches(self, exc):
+        """Whether retry_on covers the exception exc."""
+        if isinstance(exc, PipedreamError):
+            return (type(exc) in self._retry_on_exc or
+                    exc.error_code in self._retry_on_codes)
+        return isinstance(exc, self._retry_on_exc)
+
+    def should_retry(self, method, exc, attempt):
+        """Whether to retry the attempt-th request of method which failed
+        with exc. Takes a retry from the budget if so.
         """
+        if attempt > self.max_retries or not self.matches(exc):
+            return False
+        if method.upper() not in self.methods and \
+                not isinstance(exc, RateLimitError):
+            return False
+        if self.budget is not None and not self.budget.withdraw():
+            return False
+        return True
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retrying the attempt-th request."""
+        if response is not None:
+            try:
+                retry_after = response.headers.get('Retry-After')
+                if retry_after is not None:
+                    return max(0.0, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+
+def _call_policy(policy, method, retry_on, max_retries):
+    """Return policy with the retry_on and max_retries passed to a call,
+    which opt its method in to retries.
+    """
+    if not (retry_on and max_retries):
+        return policy
+    return policy.replace(retry_on=retry_on, max_retries=max_retries,
+                          methods=policy.methods | set([method.upper()]))
+
+
+MapResult = collections.namedtuple('MapResult', ['item', 'result', 'error'])
+MapResult.__doc__ = """Outcome of one item of Pipedream.map.
+
+item - the item the endpoint was called with
+result - what the endpoint returned or None if it raised
+error - the exception raised by the endpoint or None
+"""
+
+
+def _bounded_map(fn, iterable, concurrency, ordered=True):
+    """Call fn on every item of iterable in a pool of concurrency threads.
+
+    At most 2 * concurrency items are taken from iterable ahead of the
+    results being consumed, so iterable may be a lazy, unbounded stream.
+
+    Yields (item, future) pairs in input order or, if ordered is False,
+    in completion order.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be a positive integer")
+
+    window = 2 * concurrency
+    iterator = iter(iterable)
+    pending = collections.deque() if ordered else {}
+
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            while True:
+                while len(pending) < window:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    future = executor.submit(fn, item)
+                    if ordered:
+                        pending.append((item, future))
+                    else:
+                        pending[future] = item
+
+                if not pending:
+                    return
+
+                if ordered:
+                    item, future = pending.popleft()
+                    futures.wait([future])
+                    yield item, future
+                else:
+                    done, _ = futures.wait(
+                        list(pending), return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future
+        finally:
+            remaining = (f for _, f in pending) if ordered else pending
+            for future in remaining:
+                future.cancel()
+
+
+class _PipedreamBase(PipedreamAPI):
+    """What Pipedream and AsyncPipedream share: the settings of the
+    client, its hooks and how requests are built, retried and decoded.
+    Sending requests is left to the subclasses.
+    """
+
+    def __init__(self, pipedreamer_oauth=None, headers=None,
+                 client_args=None, api_version=1, retry_on=None,
+                 max_retries=0, rate_limiter=None, retry_policy=None,
+                 json_codec='auto', base_url=API_URL, hooks=None,
+                 coalesce=True):
+        """Takes the parameters of Pipedream of the same names."""
         # Set headers
         self.client_args = copy.deepcopy(client_args) or {}
         self.headers = copy.deepcopy(headers) or {}
@@ -117,7 +544,16 @@ class Pipedream(PipedreamAPI):
         # Set attributes necessary for API
         self._pipedreamer_oauth = None
 
-        self.client = requests.Session()
+        self.rate_limiter = rate_limiter
+        self.json_codec = get_codec(json_codec)
+        self.coalesce = coalesce
+        self.base_url = base_url.rstrip('/')
+        self._hooks = {}
+        for event, callables in (hooks or {}).items():
+            if callable(callables):
+                callables = [callables]
+            for hook in callables:
+                self.add_hook(event, hook)
 
         self.pipedreamer_oauth = pipedreamer_oauth
 
@@ -125,17 +561,85 @@ class Pipedream(PipedreamAPI):
             raise ValueError("Unsupported Pipedream API Version: %d" %
                              api_version)
 
-        self._retry_on = {}
-        self._max_retries = 0
-        self.retry_on = retry_on
-        self.max_retries = max_retries
+        if retry_policy is None:
+            retry_policy = RetryPolicy(retry_on=retry_on,
+                                       max_retries=max_retries,
+                                       budget=RetryBudget())
+        self.retry_policy = retry_policy
+
+    def add_hook(self, event, hook):
+        """Call hook on event, with keyword arguments only.
+
+        Hooks are called in the thread (or the task, with AsyncPipedream)
+        making the request, in the order they were added, and exceptions
+        they raise propagate to the caller. Accept **kwargs in hooks, more
+        arguments may be passed in the future. See pipedreamer.metrics.MetricsCollector for a
+        collector built on them.
+
+        Events and their arguments:
+        before_request(method, url, params, headers, attempt) - Before
+            every attempt, retries included. headers may be modified.
+        after_response(method, url, attempt, response, error, elapsed,
+            request_size, response_size) - After every attempt. response
+            is None and error the exception when no response was received.
+            elapsed is the time in seconds until the body was read, sizes
+            are the lengths of the bodies in bytes or None if unknown.
+        on_retry(method, url, attempt, response, error, delay) - When a
+            failed attempt is going to be retried after delay seconds.
+        on_sleep(reason, seconds, method, url) - Before the client sleeps:
+            reason is 'retry' between attempts, 'rate_limiter' waiting for
+            the rate_limiter and 'map_pause' when map() pauses its workers
+            after a 429.
+        on_decode(method, url, response, elapsed, size) - After the body
+            of a response has been decoded, except for streamed calls.
+
+        Parameters:
+        event - One of HOOK_EVENTS.
+        hook - Callable.
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError("Unknown hook event: %s" % event)
+        hooks = dict(self._hooks)
+        hooks[event] = hooks.get(event, ()) + (hook, )
+        # Replaced, not modified, for requests being made by other threads
+        self._hooks = hooks
+
+    def remove_hook(self, event, hook):
+        """Stop calling hook on event."""
+        hooks = dict(self._hooks)
+        remaining = tuple(h for h in hooks.get(event, ()) if h != hook)
+        if remaining:
+            hooks[event] = remaining
+        else:
+            hooks.pop(event, None)
+        self._hooks = hooks
+
+    def _emit(self, event, **info):
+        for hook in self._hooks.get(event, ()):
+            hook(**info)
+
+    def _emit_response(self, method, url, attempt, response, error, start,
+                       data=None, stream=False):
+        request_size = response_size = None
+        if response is not None:
+            request = getattr(response, 'request', None)
+            request_size = _body_size(getattr(request, 'body', data))
+            if not stream:
+                response_size = len(response.content)
+            elif response.headers.get('Content-Length'):
+                response_size = int(response.headers['Content-Length'])
+        else:
+            request_size = _body_size(data)
+        self._emit('after_response', method=method, url=url,
+                   attempt=attempt, response=response, error=error,
+                   elapsed=time.perf_counter() - start,
+                   request_size=request_size, response_size=response_size)
 
     def _update_auth(self):
         if self._pipedreamer_oauth:
-            self.client.auth = None
             self.headers['Authorization'] = 'Bearer ' + self.pipedreamer_oauth
         else:
-            self.client.auth = None
+            self.headers.pop('Authorization', None)
 
     @property
     def pipedreamer_oauth(self):
@@ -151,64 +655,378 @@ class Pipedream(PipedreamAPI):
         self._pipedreamer_oauth = None
         self._update_auth()
 
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, value):
+        if not isinstance(value, RetryPolicy):
+            raise ValueError("retry_policy must be a RetryPolicy")
+        self._retry_policy = value
+
     @property
     def retry_on(self):
-        return self._retry_on
+        return self._retry_policy.retry_on
 
     @retry_on.setter
     def retry_on(self, value):
-        if value is None:
-            self._retry_on = set()
-            return
-
-        def _validate(v):
-            exc = ("retry_on must contain only non-2xx HTTP codes"
-                   "or members of %s" % (ACCEPT_RETRIES, ))
-
-            if inspect.isclass(v):
-                if not issubclass(v, ACCEPT_RETRIES):
-                    raise ValueError(exc)
-            elif isinstance(v, int):
-                if 200 <= v < 300:
-                    raise ValueError(exc)
-            else:
-                raise ValueError(exc)
-
-        if isinstance(value, Iterable):
-            for v in value:
-                _validate(v)
-            self._retry_on = set(value)
-        else:
-            _validate(value)
-            self._retry_on = set([value])
+        self._retry_policy = self._retry_policy.replace(retry_on=value)
 
     @retry_on.deleter
     def retry_on(self):
-        self._retry_on = set()
+        self._retry_policy = self._retry_policy.replace(retry_on=None)
 
     @property
     def max_retries(self):
-        return self._max_retries
+        return self._retry_policy.max_retries
 
     @max_retries.setter
     def max_retries(self, value):
-        try:
-            value = int(value)
-            if value < 0:
-                raise ValueError
-        except (TypeError, ValueError):
-            raise ValueError("max_retries must be non-negative integer")
-
-        self._max_retries = value
+        self._retry_policy = self._retry_policy.replace(max_retries=value)
 
     @max_retries.deleter
     def max_retries(self):
-        self._max_retries = 0
+        self._retry_policy = self._retry_policy.replace(max_retries=0)
+
+    def _prepare(self, path, query, method, data, files, raw_query, kwargs):
+        """Build the parts of a request from the arguments of call().
+
+        Returns a tuple (url, params, json, data, content_type), where
+        content_type is the Content-Type header the request must be sent
+        with or None to leave it to the HTTP client.
+        """
+        # Support specifying a mime-type other than application/json
+        mime_type = kwargs.pop('mime_type', 'application/json')
+
+        for key in kwargs.keys():
+            value = kwargs[key]
+            if hasattr(value, '__iter__') and not isinstance(value, str):
+                kwargs[key] = ','.join(map(str, value))
+
+        if query:
+            if kwargs:
+                kwargs.update(query)
+            else:
+                kwargs = query
+
+        if raw_query:
+            path = path + raw_query
+            kwargs = None
+
+        url = self.base_url + path
+
+        if files:
+            # Sending multipart file. data contains parameters.
+            json = None
+            content_type = None
+        elif (mime_type == 'application/json' and
+                (method == 'POST' or method == 'PUT')):
+            # Sending JSON data, encoded here rather than by the HTTP
+            # client so that it goes through json_codec.
+            json = None
+            if data is None:
+                content_type = None
+            else:
+                data = self.json_codec.dumps(data)
+                content_type = mime_type
+        elif (mime_type != 'application/json' and
+                (method == 'POST' or method == 'PUT')):
+            # Uploading an attachment, probably.
+            # Specifying the MIME type is required.
+            json = None
+            content_type = mime_type
+        else:
+            # Probably a GET or DELETE. Not sending JSON or files.
+            json = None
+            content_type = None
+
+        return url, kwargs, json, data, content_type
+
+    def _decode(self, response, records=None):
+        """Deserialize json content if content exists.
+        Also return false non strings (0, [], (), {})
+
+        records - Record class to decode the entries of pages into
+        """
+        content_type = response.headers.get('content-type', '')
+        content = response.content
+        if 'json' in content_type and content.strip():
+            if records is not None:
+                return decode_page(content, records, self.json_codec)
+            return self.json_codec.loads(content)
+        elif 'text' in content_type and content.strip():
+            try:
+                return self.json_codec.loads(content)
+            except ValueError:
+                pass
+        return content
+
+    def _result(self, response, content, complete_response, retval):
+        if complete_response:
+            return {
+                'response': response,
+                'content': content,
+                'status': response.status_code
+            }
+
+        else:
+            if retval == 'content':
+                return content
+            elif retval == 'code':
+                return response.status_code
+            elif retval == 'location':
+                return response.headers.get('location')
+            elif retval == 'headers':
+                return response.headers
+            else:
+                # Attempt to automatically determine the value of
+                # most interest to return.
+
+                if response.headers.get('location'):
+                    # Pipedream's response is sometimes the url of a newly
+                    # created user/ticket/group/etc and they pass this through
+                    # 'location'.  Otherwise, the body of 'content'
+                    # has our response.
+                    return response.headers.get('location')
+                elif content:
+                    return content
+                else:
+                    return response.status_code
+
+    def _retry_delay(self, resp, retry_policy=None, method='GET', attempt=1):
+        """Decide whether the exception being handled should be retried.
+
+        Must be called in an except block. Re-raises the exception if it
+        should not be retried, otherwise returns the number of seconds to
+        wait before the next attempt. Parameters are those of
+        _handle_retry.
+        """
+        exc_t, exc_v, exc_tb = sys.exc_info()
+
+        if exc_t is None:
+            raise TypeError('Must be called in except block.')
+
+        if retry_policy is None:
+            retry_policy = self._retry_policy
+
+        if not retry_policy.should_retry(method, exc_v, attempt):
+            raise exc_v.with_traceback(exc_tb)
+
+        return retry_policy.delay(attempt, resp)
+
+
+class Pipedream(_PipedreamBase):
+    """ Python API Wrapper for Pipedream
+
+    Thread safety: call() never modifies the client, the headers and retry
+    policy of every request are built for that request only. A single
+    instance can therefore be shared by any number of threads, as long as
+    its attributes (headers, retry_on, pipedreamer_oauth, ...) aren't
+    changed while requests are in flight. Size the connection pool for the
+    number of threads sharing the client, e.g. for 16 workers:
+
+        z = Pipedream(token, pool_maxsize=16)
+        with ThreadPoolExecutor(16) as pool:
+            pool.map(z.source_delete, source_ids)
+
+    Identical GET requests made by several threads at the same time are
+    coalesced into a single request, see the coalesce argument.
+    """
+
+    def __init__(self, pipedreamer_oauth=None,
+                 headers=None, client_args=None, api_version=1,
+                 retry_on=None, max_retries=0, pool_connections=10,
+                 pool_maxsize=10, rate_limiter=None, retry_policy=None,
+                 cache=None, json_codec='auto', base_url=API_URL,
+                 hooks=None, coalesce=True, transport=None, keepalive=None,
+                 idle_timeout=None, share_connections=False):
+        """
+        Instantiates an instance of Pipedream. Takes optional parameters for
+        HTTP Basic Authentication
+
+        Parameters:
+        pipedreamer_token - use oauth token for authentication
+        headers - Pass headers in dict form. This will override default.
+        client_args - Pass arguments to http client in dict form.
+            {'allow_redirects': False, 'timeout': 2}
+            or a common one is to disable SSL certficate validation
+            {'verify': False}
+        retry_on - Specify any exceptions from ACCEPT_RETRIES or non-2xx
+            HTTP codes on which you want to retry request.
+            Note that calling Pipedream.call with get_all_pages=True can make
+            up to (max_retries + 1) * pages.
+            Defaults to empty set, but can be any iterable, exception or int,
+            which will become set with same values you provided.
+        max_retries - How many additional connections to make when
+            first one fails. No effect when retry_on evaluates to False.
+            Defaults to 0.
+        retry_policy - RetryPolicy to use instead of one built from
+            retry_on and max_retries, which retries idempotent requests
+            only, backs off exponentially and is limited by a RetryBudget
+            of the client.
+        pool_connections - Number of connection pools (one per host) to
+            cache. Defaults to 10.
+        pool_maxsize - Maximum number of connections kept open per host.
+            Set it to the number of threads sharing the client.
+            Defaults to 10.
+        rate_limiter - pipedreamer.ratelimit.RateLimiter every request
+            (including retries) takes a token from before being made.
+            Share one between all clients counting against the same quota.
+            Defaults to None (no client side limit).
+        cache - pipedreamer.cache.ResponseCache for GET responses. Other
+            requests invalidate the entries of the resources they change.
+            See also mount_cache(). Defaults to None (no caching).
+        json_codec - JSON backend encoding request and decoding response
+            bodies: 'auto' (default) for orjson or ujson if installed,
+            falling back to the standard library, 'json', 'orjson',
+            'ujson' or a pipedreamer.codec.JSONCodec instance.
+        base_url - URL the API paths are relative to. Defaults to
+            API_URL, change it to talk to a proxy or a mock server.
+        hooks - dict mapping events of HOOK_EVENTS to a callable or a list
+            of callables, see add_hook().
+        coalesce - Share a single request between the threads making
+            identical GET requests (same path, query, headers and retry
+            policy) at the same time: they all get the response of the
+            first one.
+            Defaults to True.
+        transport - How requests are sent: 'requests' (default) for a
+            pipedreamer.transport.RequestsTransport over HTTP/1.1, 'http2'
+            for an HTTPXTransport multiplexing requests over HTTP/2, or a
+            transport instance.
+        keepalive - Seconds of inactivity after which TCP keep-alive
+            probes are sent on idle connections. Defaults to None (no
+            probes).
+        idle_timeout - Seconds a connection may stay idle and still be
+            reused. Set it below the keep-alive timeout of the server (or
+            of the load balancer in front of it). Defaults to None (no
+            limit, 5 seconds with the 'http2' transport).
+        share_connections - Share the connections of the 'requests'
+            transport between the clients of the process created with the
+            same pool settings, so that a new client reuses the
+            connections and TLS sessions others already opened, see
+            warm(). Defaults to False.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.share_connections = share_connections
+        self._flights = SingleFlight()
+        self._caches = []
+
+        super(Pipedream, self).__init__(
+            pipedreamer_oauth=pipedreamer_oauth, headers=headers,
+            client_args=client_args, api_version=api_version,
+            retry_on=retry_on, max_retries=max_retries,
+            rate_limiter=rate_limiter, retry_policy=retry_policy,
+            json_codec=json_codec, base_url=base_url, hooks=hooks,
+            coalesce=coalesce)
+
+        if cache is not None:
+            self.mount_cache('', cache)
+        self.transport = self._new_transport(transport)
+
+    def mount_cache(self, prefix, cache):
+        """Serve the GET requests of paths starting with prefix from cache.
+
+        The cache mounted on the longest matching prefix is used. Mounting
+        on '' is the same as passing cache to the constructor.
+
+        Example:
+            z.mount_cache('/components/', DiskCache('/var/cache/pd'))
+
+        Parameters:
+        prefix - Path prefix, e.g. '/components/'.
+        cache - pipedreamer.cache.ResponseCache, DiskCache or any object
+            with the same interface. None unmounts the prefix.
+        """
+        caches = [(p, c) for p, c in self._caches if p != prefix]
+        if cache is not None:
+            caches.append((prefix, cache))
+        caches.sort(key=lambda m: len(m[0]), reverse=True)
+        # Replaced, not modified, for requests being made by other threads
+        self._caches = caches
+
+    @property
+    def cache(self):
+        """The cache mounted on '', see mount_cache()."""
+        for prefix, cache in self._caches:
+            if prefix == '':
+                return cache
+        return None
+
+    @cache.setter
+    def cache(self, value):
+        self.mount_cache('', value)
+
+    def _sleep(self, reason, seconds, method=None, url=None):
+        if self._hooks:
+            self._emit('on_sleep', reason=reason, seconds=seconds,
+                       method=method, url=url)
+        time.sleep(seconds)
+
+    def _new_transport(self, transport):
+        if transport is None or transport == 'requests':
+            return RequestsTransport(pool_connections=self.pool_connections,
+                                     pool_maxsize=self.pool_maxsize,
+                                     keepalive=self.keepalive,
+                                     idle_timeout=self.idle_timeout,
+                                     shared=self.share_connections)
+        if transport == 'http2':
+            kwargs = {}
+            if self.idle_timeout is not None:
+                kwargs['keepalive_expiry'] = self.idle_timeout
+            return HTTPXTransport(http2=True,
+                                  max_connections=self.pool_maxsize, **kwargs)
+        if isinstance(transport, str):
+            raise ValueError("Unknown transport: %s" % transport)
+        return transport
+
+    @property
+    def client(self):
+        """requests.Session of the RequestsTransport, None with other
+        transports. Setting it makes the client use a RequestsTransport
+        of the given session.
+        """
+        return getattr(self.transport, 'session', None)
+
+    @client.setter
+    def client(self, value):
+        self.transport = RequestsTransport(value)
+
+    def close(self):
+        """Close the connections of the transport."""
+        self.transport.close()
+
+    def warm(self, connections=1):
+        """Connect to the API ahead of the first request, which then
+        doesn't pay for the DNS lookup and the TCP and TLS handshakes.
+
+        Call it when the client is created, e.g. while a short lived worker
+        is still loading, with as many connections as threads will share
+        the client:
+
+            z = Pipedream(token, pool_maxsize=8, share_connections=True)
+            z.warm(8)
+
+        Parameters:
+        connections - Number of connections to open, concurrently.
+            Defaults to 1.
+
+        Returns: number of connections opened, 0 when the transport has no
+            warm() method.
+        """
+        warm = getattr(self.transport, 'warm', None)
+        if warm is None:
+            return 0
+        return warm(self.base_url + '/', connections, **self.client_args)
 
     def call(self, path, query=None, method='GET', data=None,
              files=None, get_all_pages=False, complete_response=False,
              retry_on=None, max_retries=0, raw_query=None, retval=None,
-             **kwargs):
+             iterate=False, prefetch=0, retry_policy=None, stream=False,
+             records=None, **kwargs):
         """Make a REST call to the Pipedream web service.
 
         Parameters:
@@ -217,7 +1035,29 @@ class Pipedream(PipedreamAPI):
         method - HTTP method to use in making the request.
         data - POST data or multi-part form data to include.
         files - Requests style dict of files for multi-part file uploads.
-        get_all_pages - Make multiple requests and follow next_page.
+        get_all_pages - Make multiple requests following the page_info
+            end_cursor and return a single result with every page's data
+            concatenated.
+        iterate - Return a generator yielding the decoded content of each
+            page as it arrives instead of a single result. Only the page
+            being consumed is kept in memory. See also iter_pages() and
+            iter_items().
+        prefetch - With get_all_pages or iterate, fetch up to this many
+            pages ahead in a background thread while the current one is
+            being processed, so network time overlaps with the caller's
+            work. Defaults to 0 (pages are fetched on demand).
+        stream - Return a generator yielding the records of the data array
+            of each page one by one, following the page cursors. Records
+            are decoded while the response is being received, so memory
+            is bounded by one record rather than one page. The response
+            cache and prefetch don't apply to streamed calls.
+        records - Return the entries of the data list of pages as compact
+            pipedreamer.records.Record objects instead of dicts. Either a
+            Record class or True to pick the class from the path (event
+            summaries, sources and webhooks). This saves memory, not
+            decoding time: the event payload of EventSummary records is
+            decoded with the page, encoded back and decoded again when
+            accessed, see pipedreamer.records.decode_page().
         complete_response - Return raw request results.
         retry_on - Specify any exceptions from ACCEPT_RETRIES or non-2xx
             HTTP codes on which you want to retry request.
@@ -227,7 +1067,10 @@ class Pipedream(PipedreamAPI):
             which will become set with same values you provided.
         max_retries - How many additional connections to make when
             first one fails. No effect when retry_on evaluates to False.
-            Defaults to 0.
+            Defaults to 0. Passing both retries the call whatever its
+            method, non-idempotent ones included.
+        retry_policy - RetryPolicy to use for this call instead of the
+            client's. Overrides retry_on and max_retries.
         raw_query - Raw query string, starting with '?', that will be
             appended to the URL path and will completely override / discard
             any other query parameters. Enables use cases where query
@@ -239,208 +1082,392 @@ class Pipedream(PipedreamAPI):
             to determine an appropriate value to return is used.
         """
 
-        # Rather obscure way to support retry_on per single API call
-        if retry_on and max_retries:
-            try:
-                _retry_on = self._retry_on
-                _max_retries = self._max_retries
-
-                self.retry_on = retry_on
-                self.max_retries = max_retries
-                return self.call(path=path,
-                                 query=query,
-                                 method=method,
-                                 data=data,
-                                 files=files,
-                                 get_all_pages=get_all_pages,
-                                 complete_response=complete_response)
-            finally:
-                self._retry_on = _retry_on
-                self._max_retries = _max_retries
+        # Retry policy and headers are local to this request so that the
+        # client can be shared between threads.
+        if retry_policy is None:
+            retry_policy = _call_policy(self._retry_policy, method,
+                                        retry_on, max_retries)
 
-        # Support specifying a mime-type other than application/json
-        mime_type = kwargs.pop('mime_type', 'application/json')
+        url, kwargs, json, data, content_type = self._prepare(
+            path, query, method, data, files, raw_query, kwargs)
 
-        for key in kwargs.keys():
-            value = kwargs[key]
-            if hasattr(value, '__iter__') and not isinstance(value, str):
-                kwargs[key] = ','.join(map(str, value))
+        headers = dict(self.headers)
+        if content_type:
+            headers['Content-Type'] = content_type
+        else:
+            headers.pop('Content-Type', None)
 
-        if query:
-            if kwargs:
-                kwargs.update(query)
+        if records is True:
+            records = record_type(path)
+
+        if stream:
+            return self._iter_streamed(method, url, kwargs, json, data,
+                                       files, headers, retry_policy, records)
+
+        pages = self._iter_pages(method, url, kwargs, json, data, files,
+                                 headers, retry_policy, records)
+
+        if not get_all_pages and not iterate:
+            response, content = next(pages)
+            pages.close()
+            return self._result(response, content,
+                                complete_response, retval)
+
+        if prefetch:
+            pages = _prefetch(pages, prefetch)
+
+        if iterate:
+            return (content for _, content in pages)
+
+        # Concatenate the data of every page into the final page so the
+        # result keeps the shape of a single page.
+        items = []
+        for response, content in pages:
+            page_items = _page_items(content)
+            if page_items is None:
+                return self._result(response, content,
+                                    complete_response, retval)
+            items.extend(page_items)
+
+        content['data'] = items
+        if isinstance(content.get('page_info'), dict):
+            content['page_info']['count'] = len(items)
+        return self._result(response, content, complete_response, retval)
+
+    def iter_pages(self, endpoint, *args, **kwargs):
+        """Lazily iterate over the pages of a paginated endpoint.
+
+        Pages are requested one at a time, following the end_cursor
+        returned in each page's page_info, and yielded as soon as they
+        have been decoded. Nothing is fetched before the generator is
+        consumed.
+
+        Example:
+            for page in z.iter_pages(z.source_event_summaries, source_id,
+                                     limit=100):
+                print(page['page_info']['count'])
+
+        Pass prefetch=N to have up to N pages fetched ahead in a background
+        thread while the current one is being processed.
+
+        Parameters:
+        endpoint - Bound API method (e.g. z.users_me_sources_) or its name.
+        *args, **kwargs - Passed to the endpoint as usual.
+        """
+        if not callable(endpoint):
+            endpoint = getattr(self, endpoint)
+        return endpoint(*args, iterate=True, **kwargs)
+
+    def iter_items(self, endpoint, *args, **kwargs):
+        """Lazily iterate over the records of a paginated endpoint.
+
+        Same as iter_pages(), but yields the entries of each page's data
+        list one by one. With stream=True, the entries are decoded as they
+        are received instead of once their whole page has been, which
+        bounds memory by one entry (see call()).
+
+        Example:
+            for event in z.iter_items('source_event_summaries', source_id,
+                                      expand='event', stream=True):
+                handle(event)
+        """
+        if kwargs.get('stream'):
+            if not callable(endpoint):
+                endpoint = getattr(self, endpoint)
+            for item in endpoint(*args, **kwargs):
+                yield item
+            return
+
+        for page in self.iter_pages(endpoint, *args, **kwargs):
+            items = _page_items(page)
+            if items is None:
+                continue
+            for item in items:
+                yield item
+
+    def map(self, endpoint, items, concurrency=4, ordered=True,
+            rate_limit_retries=3, **kwargs):
+        """Call an API method for every item using a pool of threads.
+
+        Errors are collected per item instead of aborting the run. When a
+        call hits the rate limit (RateLimitError), all workers pause for
+        the Retry-After the API asked for and the call is repeated, up to
+        rate_limit_retries times.
+
+        Example:
+            for r in z.map(z.source_delete, source_ids, concurrency=8):
+                if r.error:
+                    print('could not delete', r.item, r.error)
+
+        Parameters:
+        endpoint - Bound API method (e.g. z.source_delete), its name, or
+            any callable taking an item as first argument.
+        items - Iterable of items, typically ids. Consumed lazily.
+        concurrency - Number of worker threads. Defaults to 4. Consider
+            the pool_maxsize of the client when raising it.
+        ordered - Yield results in the order of items (default) or as soon
+            as they complete.
+        rate_limit_retries - How many times to repeat a call rejected by
+            the rate limit. Defaults to 3.
+        **kwargs - Passed to every call of endpoint.
+
+        Returns: generator of MapResult(item, result, error)
+        """
+        if not callable(endpoint):
+            endpoint = getattr(self, endpoint)
+
+        lock = threading.Lock()
+        state = {'resume_at': 0}
+
+        def _call(item):
+            attempts = 0
+            while True:
+                with lock:
+                    wait = state['resume_at'] - time.time()
+                if wait > 0:
+                    self._sleep('map_pause', wait)
+
+                try:
+                    return endpoint(item, **kwargs)
+                except RateLimitError as e:
+                    if attempts >= rate_limit_retries:
+                        raise
+                    attempts += 1
+                    try:
+                        retry_after = float(
+                            e.response.headers.get('Retry-After', 1))
+                    except (AttributeError, TypeError, ValueError):
+                        retry_after = 1
+                    with lock:
+                        state['resume_at'] = max(state['resume_at'],
+                                                 time.time() + retry_after)
+
+        for item, future in _bounded_map(_call, items, concurrency, ordered):
+            error = future.exception()
+            if error is None:
+                yield MapResult(item, future.result(), None)
             else:
-                kwargs = query
+                yield MapResult(item, None, error)
 
-        if raw_query:
-            path = path + raw_query
-            kwargs = None
+    def _iter_pages(self, method, url, params, json, data, files, headers,
+                    retry_policy, records=None):
+        """Request url and follow the page_info cursors of the responses.
 
-        url = 'https://api.pipedream.com/v1' + path
+        Yields (response, content) for every page. A response that is not
+        a page of results ends the iteration after being yielded.
+        """
+        seen = 0
+        cursor = None
+
+        while True:
+            if method == 'GET' and self.coalesce:
+                response = self._flights.do(
+                    _flight_key(url, params, headers, retry_policy),
+                    self._cached_request,
+                    method, url, params, json, data, files, headers,
+                    retry_policy)
+            else:
+                response = self._cached_request(method, url, params, json,
+                                                data, files, headers,
+                                                retry_policy)
+            if 'on_decode' in self._hooks:
+                start = time.perf_counter()
+                content = self._decode(response, records)
+                self._emit('on_decode', method=method, url=response.url,
+                           response=response,
+                           elapsed=time.perf_counter() - start,
+                           size=len(response.content))
+            else:
+                content = self._decode(response, records)
 
-        if files:
-            # Sending multipart file. data contains parameters.
-            json = None
-            self.headers.pop('Content-Type', None)
-        elif (mime_type == 'application/json' and
-                (method == 'POST' or method == 'PUT')):
-            # Sending JSON data.
-            json = data
-            data = {}
-            self.headers.pop('Content-Type', None)
-        elif (mime_type != 'application/json' and
-                (method == 'POST' or method == 'PUT')):
-            # Uploading an attachment, probably.
-            # Specifying the MIME type is required.
-            json = None
-            self.headers['Content-Type'] = mime_type
-        else:
-            # Probably a GET or DELETE. Not sending JSON or files.
-            json = None
-            self.headers.pop('Content-Type', None)
+            seen, cursor = _next_cursor(content, cursor, seen)
+
+            yield response, content
+            # Don't keep the previous page alive while fetching the next one
+            response = content = None
+
+            if cursor is None:
+                return
+
+            params = dict(params or {})
+            params['after'] = cursor
+
+    def _iter_streamed(self, method, url, params, json, data, files,
+                       headers, retry_policy, records=None):
+        """Request url and follow the page_info cursors of the responses,
+        yielding the records of their data arrays while they are received.
+        """
+        seen = 0
+        cursor = None
+
+        while True:
+            response = self._request(method, url, params, json, data, files,
+                                     headers, retry_policy, stream=True)
+            try:
+                entries = JSONArrayStream(
+                    response.iter_content(STREAM_CHUNK_SIZE))
+                count = 0
+                for entry in entries:
+                    count += 1
+                    if records is not None and isinstance(entry, dict):
+                        entry = records.from_dict(entry)
+                    yield entry
+            finally:
+                response.close()
 
-        all_requests_complete = False
+            page_info = entries.rest.get('page_info')
+            if not isinstance(page_info, dict):
+                return
+
+            seen, cursor = _cursor_after(page_info, count, cursor, seen)
+            if cursor is None:
+                return
+
+            params = dict(params or {})
+            params['after'] = cursor
+
+    def _cached_request(self, method, url, params, json, data, files,
+                        headers, retry_policy):
+        """Make a request through the response cache, if any.
+
+        Fresh entries are returned without a request and stale ones are
+        revalidated with their ETag. Successful non-GET requests
+        invalidate the entries they affect.
+        """
+        caches = self._caches
+        if not caches:
+            return self._request(method, url, params, json, data, files,
+                                 headers, retry_policy)
+
+        path = url[len(self.base_url):]
+        if method != 'GET':
+            response = self._request(method, url, params, json, data, files,
+                                     headers, retry_policy)
+            invalidated = set()
+            for _, cache in caches:
+                # Caches index their keys, see ResponseCache.invalidate
+                if id(cache) not in invalidated:
+                    invalidated.add(id(cache))
+                    cache.invalidate(path)
+            return response
+
+        for prefix, cache in caches:
+            if path.startswith(prefix):
+                break
+        else:
+            return self._request(method, url, params, json, data, files,
+                                 headers, retry_policy)
+
+        key = cache_key(path, params, headers.get('Authorization'))
+        entry = cache.get(key)
+        if entry is not None:
+            if cache.fresh(entry):
+                return _cached_response(entry, url)
+            etag = CaseInsensitiveDict(entry.headers).get('ETag')
+            if etag:
+                headers = dict(headers)
+                headers['If-None-Match'] = etag
+            else:
+                entry = None
+
+        response = self._request(method, url, params, json, data, files,
+                                 headers, retry_policy)
+
+        if response.status_code == 304 and entry is not None:
+            cache.touch(key)
+            return _cached_response(entry, url)
+        if response.status_code == 200:
+            cache.set(key, CacheEntry(response.status_code,
+                                      dict(response.headers),
+                                      response.content, time.time()))
+        return response
+
+    def _request(self, method, url, params, json, data, files, headers,
+                 retry_policy, stream=False):
+        """Make an http request, retrying as configured.
+
+        Returns the requests.Response of the first successful attempt or
+        raises the exception of the last failed one.
+        """
+        if retry_policy.budget is not None:
+            retry_policy.budget.deposit()
         request_count = 0
+        # Hooks cost a single test per attempt when there are none
+        hooks = self._hooks
 
-        while not all_requests_complete:
-            # Make an http request
+        while True:
             # counts request attempts in order to fetch this specific one
             request_count += 1
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    self._sleep('rate_limiter', wait, method, url)
+            if hooks:
+                self._emit('before_request', method=method, url=url,
+                           params=params, headers=headers,
+                           attempt=request_count)
+                start = time.perf_counter()
             try:
-                response = self.client.request(method,
-                                               url,
-                                               params=kwargs,
-                                               json=json,
-                                               data=data,
-                                               headers=self.headers,
-                                               files=files,
-                                               **self.client_args)
-            except requests.RequestException:
-                if request_count <= self.max_retries:
-                    # we have to bind response to None in case
-                    # self.client.request raises an exception and
-                    # response holds old requests.Response
-                    # (and possibly its Retry-After header)
-                    response = None
-                    self._handle_retry(response)
-                    continue
-                else:
-                    raise
+                response = self._send(method, url, params, json, data, files,
+                                      headers, stream)
+            except requests.RequestException as e:
+                # we have to bind response to None in case
+                # self._send raises an exception and
+                # response holds old requests.Response
+                # (and possibly its Retry-After header)
+                response = None
+                if hooks:
+                    self._emit_response(method, url, request_count, None, e,
+                                        start, data)
+                self._handle_retry(response, retry_policy, method,
+                                   request_count, url)
+                continue
+
+            if hooks:
+                self._emit_response(method, url, request_count, response,
+                                    None, start, data, stream)
+
+            if response.status_code == 304 and 'If-None-Match' in headers:
+                # Cache entry still valid, see _cached_request
+                return response
 
-            # If the response status is not in the 200 range then assume an
-            # error and raise proper exception
-
-            code = response.status_code
             try:
-                if not 200 <= code < 300 and code != 422:
-                    if code == 401:
-                        raise AuthenticationError(
-                            response.content, code, response)
-                    elif code == 429:
-                        raise RateLimitError(
-                            response.content, code, response)
-                    else:
-                        raise PipedreamError(
-                            response.content, code, response)
+                _check_response(response)
             except PipedreamError:
-                if request_count <= self.max_retries:
-                    self._handle_retry(response)
-                    continue
-                else:
-                    raise
-
-            # Deserialize json content if content exists.
-            # Also return false non strings (0, [], (), {})
-            if response.content.strip() and 'json' in response.headers['content-type']:
-                content = response.json()
-
-                # set url to the next page if that was returned in the response
-                url = content.get('next_page', None)
-                # url we get above already has the start_time appended to it,
-                # specific to incremental exports
-                kwargs = {}
-            elif response.content.strip() and 'text' in response.headers['content-type']:
-                try:
-                    content = response.json()
-                    # set url to the next page if that was returned in the response
-                    url = content.get('next_page', None)
-                    # url we get above already has the start_time appended to it,
-                    # specific to incremental exports
-                    kwargs = {}
-                except ValueError:
-                    content = response.content
-            else:
-                content = response.content
-                url = None
-
-            if complete_response:
-                return {
-                    'response': response,
-                    'content': content,
-                    'status': response.status_code
-                }
-
-            else:
-                if retval == 'content':
-                    return content
-                elif retval == 'code':
-                    return response.status_code
-                elif retval == 'location':
-                    return response.headers.get('location')
-                elif retval == 'headers':
-                    return response.headers
-                else:
-                    # Attempt to automatically determine the value of
-                    # most interest to return.
-
-                    if response.headers.get('location'):
-                        # Pipedream's response is sometimes the url of a newly
-                        # created user/ticket/group/etc and they pass this through
-                        # 'location'.  Otherwise, the body of 'content'
-                        # has our response.
-                        return response.headers.get('location')
-                    elif content:
-                        return content
-                    else:
-                        return response.status_code
+                self._handle_retry(response, retry_policy, method,
+                                   request_count, url)
+                continue
 
-        # Don't expect to ever make it here
-        return result
+            return response
 
+    def _send(self, method, url, params, json, data, files, headers,
+              stream=False):
+        """Make a single request with the transport."""
+        return self.transport.request(method, url, params=params, json=json,
+                                      data=data, files=files, headers=headers,
+                                      stream=stream, **self.client_args)
 
-    def _handle_retry(self, resp):
+    def _handle_retry(self, resp, retry_policy=None, method='GET',
+                      attempt=1, url=None):
         """Handle any exceptions during API request or
         parsing its response status code.
 
         Parameters:
         resp: requests.Response instance obtained during concerning request
             or None, when request failed
+        retry_policy: RetryPolicy to use instead of the client's
+        method: HTTP method of the request
+        attempt: number of the attempt that failed, starting at 1
+        url: URL of the request, for the hooks
 
         Returns: True if should retry our request or raises original Exception
         """
-        exc_t, exc_v, exc_tb = sys.exc_info()
-
-        if exc_t is None:
-            raise TypeError('Must be called in except block.')
-
-        retry_on_exc = tuple(
-            (x for x in self._retry_on if inspect.isclass(x)))
-        retry_on_codes = tuple(
-            (x for x in self._retry_on if isinstance(x, int)))
-
-        if issubclass(exc_t, PipedreamError):
-            code = exc_v.error_code
-            if exc_t not in retry_on_exc and code not in retry_on_codes:
-                six.reraise(exc_t, exc_v, exc_tb)
-        else:
-            if not issubclass(exc_t, retry_on_exc):
-                six.reraise(exc_t, exc_v, exc_tb)
-
-        if resp is not None:
-            try:
-                retry_after = float(resp.headers.get('Retry-After', 0))
-                time.sleep(retry_after)
-            except (TypeError, ValueError):
-                pass
+        retry_after = self._retry_delay(resp, retry_policy, method, attempt)
+        if self._hooks:
+            self._emit('on_retry', method=method, url=url, attempt=attempt,
+                       response=resp, error=sys.exc_info()[1],
+                       delay=retry_after)
+        if retry_after:
+            self._sleep('retry', retry_after, method, url)
 
         return True
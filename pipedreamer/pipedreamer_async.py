@@ -0,0 +1,494 @@
+import asyncio
+import itertools
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .jsonstream import JSONArrayStream
+from .pipedreamer import (API_URL, STREAM_CHUNK_SIZE, PipedreamError,
+                          _PipedreamBase, _call_policy, _check_response,
+                          _cursor_after, _flight_key, _next_cursor,
+                          _page_items)
+from .records import record_type
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Records decoded per hop to the thread parsing a streamed response
+STREAM_BATCH = 64
+
+
+class _AsyncResponse(object):
+    """Fully read aiohttp response exposing the parts of requests.Response
+    used by Pipedream, so responses are decoded and mapped to exceptions
+    the same way for both clients.
+
+    Streamed responses aren't read: content is None and raw the open
+    aiohttp response, see AsyncPipedream._iter_streamed().
+    """
+
+    def __init__(self, status_code, headers, content, url, raw=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.raw = raw
+
+
+def _read_chunks(response, loop):
+    """Iterate over the body of an aiohttp response from a thread other
+    than the one running loop, which reads it.
+    """
+    while True:
+        chunk = asyncio.run_coroutine_threadsafe(
+            response.content.read(STREAM_CHUNK_SIZE), loop).result()
+        if not chunk:
+            return
+        yield chunk
+
+
+def _take(iterator, count):
+    return list(itertools.islice(iterator, count))
+
+
+async def _prefetch(pages, depth):
+    """Async version of pipedreamer._prefetch running pages in a task."""
+    items = asyncio.Queue(maxsize=depth)
+    done = object()
+
+    async def _produce():
+        try:
+            async for item in pages:
+                await items.put((item, None))
+        except Exception as e:
+            await items.put((done, e))
+        else:
+            await items.put((done, None))
+
+    task = asyncio.ensure_future(_produce())
+
+    try:
+        while True:
+            item, exc = await items.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+            item = None
+    finally:
+        task.cancel()
+
+
+class AsyncPipedream(_PipedreamBase):
+    """asyncio Python API Wrapper for Pipedream.
+
+    Every API method returns a coroutine. Requests go through a shared
+    aiohttp connection pool and at most `concurrency` of them are in
+    flight at once, so fanning out over many resources doesn't need a
+    thread per request.
+
+    Example:
+        async with AsyncPipedream(token, concurrency=20) as z:
+            sources = await z.users_me_sources_(get_all_pages=True)
+            summaries = await asyncio.gather(*(
+                z.source_event_summaries(s['id'])
+                for s in sources['data']))
+
+    AsyncPipedream isn't a Pipedream: it has no response cache, map() or
+    warm(), and the helpers built on Pipedream (EventSync, Reconciler,
+    ResourceIndex, EventExporter) don't accept it.
+
+    Requires the aiohttp package.
+    """
+
+    # The aiohttp session, see _session()
+    client = None
+
+    def __init__(self, pipedreamer_oauth=None,
+                 headers=None, client_args=None, api_version=1,
+                 retry_on=None, max_retries=0, concurrency=10,
+                 pool_size=100, rate_limiter=None, retry_policy=None,
+                 json_codec='auto', base_url=API_URL, hooks=None,
+                 coalesce=True):
+        """
+        Instantiates an instance of AsyncPipedream. Takes the parameters of
+        Pipedream, except cache and those of its transport, and
+        additionally:
+
+        concurrency - Maximum number of requests in flight at once.
+            Defaults to 10.
+        pool_size - Maximum number of connections kept in the pool.
+            Defaults to 100.
+
+        client_args understands the requests style 'timeout', 'verify' and
+        'allow_redirects' arguments.
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncPipedream requires the aiohttp package")
+
+        super(AsyncPipedream, self).__init__(
+            pipedreamer_oauth=pipedreamer_oauth, headers=headers,
+            client_args=client_args, api_version=api_version,
+            retry_on=retry_on, max_retries=max_retries,
+            rate_limiter=rate_limiter, retry_policy=retry_policy,
+            json_codec=json_codec, base_url=base_url, hooks=hooks,
+            coalesce=coalesce)
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self._semaphore = None
+        # Futures of the GET requests in flight, see _coalesced_request
+        self._in_flight = {}
+
+    async def _session(self):
+        if self.client is None or self.client.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.client = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self.client
+
+    async def close(self):
+        """Close the connection pool."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def __aenter__(self):
+        await self._session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _client_args(self):
+        args = {}
+        for key, value in self.client_args.items():
+            if key == 'timeout':
+                if isinstance(value, tuple):
+                    connect, read = value
+                    value = aiohttp.ClientTimeout(sock_connect=connect,
+                                                  sock_read=read)
+                elif value is not None:
+                    # Like requests, time the connection and every read
+                    # rather than the whole request
+                    value = aiohttp.ClientTimeout(sock_connect=value,
+                                                  sock_read=value)
+                args['timeout'] = value
+            elif key == 'verify':
+                if not value:
+                    args['ssl'] = False
+            elif key == 'allow_redirects':
+                args[key] = value
+            else:
+                raise ValueError("Unsupported client argument for "
+                                 "AsyncPipedream: %s" % key)
+        return args
+
+    async def call(self, path, query=None, method='GET', data=None,
+                   files=None, get_all_pages=False, complete_response=False,
+                   retry_on=None, max_retries=0, raw_query=None, retval=None,
+                   iterate=False, prefetch=0, retry_policy=None,
+                   stream=False, records=None, **kwargs):
+        """Make a REST call to the Pipedream web service.
+
+        Takes the same parameters as Pipedream.call. With iterate=True the
+        awaited result is an async generator of pages, with stream=True an
+        async generator of the records of the pages, which records= turns
+        into pipedreamer.records.Record objects. Streamed responses
+        are decoded in a thread of the default executor of the loop,
+        STREAM_BATCH records at a time.
+        """
+        if retry_policy is None:
+            retry_policy = _call_policy(self._retry_policy, method,
+                                        retry_on, max_retries)
+
+        url, params, json, data, content_type = self._prepare(
+            path, query, method, data, files, raw_query, kwargs)
+
+        headers = dict(self.headers)
+        if content_type:
+            headers['Content-Type'] = content_type
+        else:
+            headers.pop('Content-Type', None)
+
+        if files:
+            form = aiohttp.FormData()
+            for key, value in (data or {}).items():
+                form.add_field(key, str(value))
+            for key, value in files.items():
+                if isinstance(value, tuple):
+                    form.add_field(key, value[1], filename=value[0],
+                                   content_type=(value[2] if len(value) > 2
+                                                 else None))
+                else:
+                    form.add_field(key, value)
+            data = form
+
+        if records is True:
+            records = record_type(path)
+
+        if stream:
+            return self._iter_streamed(method, url, params, json, data,
+                                       headers, retry_policy, records)
+
+        pages = self._iter_pages(method, url, params, json, data, headers,
+                                 retry_policy, records)
+
+        if not get_all_pages and not iterate:
+            response, content = await pages.__anext__()
+            await pages.aclose()
+            return self._result(response, content,
+                                complete_response, retval)
+
+        if prefetch:
+            pages = _prefetch(pages, prefetch)
+
+        if iterate:
+            return self._contents(pages)
+
+        items = []
+        async for response, content in pages:
+            page_items = _page_items(content)
+            if page_items is None:
+                return self._result(response, content,
+                                    complete_response, retval)
+            items.extend(page_items)
+
+        content['data'] = items
+        if isinstance(content.get('page_info'), dict):
+            content['page_info']['count'] = len(items)
+        return self._result(response, content, complete_response, retval)
+
+    async def iter_pages(self, endpoint, *args, **kwargs):
+        """Lazily iterate over the pages of a paginated endpoint.
+
+        Async version of Pipedream.iter_pages:
+
+            async for page in z.iter_pages(z.source_event_summaries, id):
+                ...
+        """
+        if not callable(endpoint):
+            endpoint = getattr(self, endpoint)
+        pages = await endpoint(*args, iterate=True, **kwargs)
+        async for page in pages:
+            yield page
+
+    async def iter_items(self, endpoint, *args, **kwargs):
+        """Lazily iterate over the records of a paginated endpoint.
+
+        Async version of Pipedream.iter_items.
+        """
+        if kwargs.get('stream'):
+            if not callable(endpoint):
+                endpoint = getattr(self, endpoint)
+            async for item in await endpoint(*args, **kwargs):
+                yield item
+            return
+
+        async for page in self.iter_pages(endpoint, *args, **kwargs):
+            items = _page_items(page)
+            if items is None:
+                continue
+            for item in items:
+                yield item
+
+    async def _contents(self, pages):
+        async for _, content in pages:
+            yield content
+
+    async def _iter_pages(self, method, url, params, json, data, headers,
+                          retry_policy, records=None):
+        seen = 0
+        cursor = None
+
+        while True:
+            if method == 'GET' and self.coalesce:
+                response = await self._coalesced_request(
+                    method, url, params, json, data, headers, retry_policy)
+            else:
+                response = await self._request(method, url, params, json,
+                                               data, headers, retry_policy)
+            if 'on_decode' in self._hooks:
+                start = time.perf_counter()
+                content = self._decode(response, records)
+                self._emit('on_decode', method=method, url=response.url,
+                           response=response,
+                           elapsed=time.perf_counter() - start,
+                           size=len(response.content))
+            else:
+                content = self._decode(response, records)
+            seen, cursor = _next_cursor(content, cursor, seen)
+
+            yield response, content
+            response = content = None
+
+            if cursor is None:
+                return
+
+            params = dict(params or {})
+            params['after'] = cursor
+
+    async def _iter_streamed(self, method, url, params, json, data, headers,
+                             retry_policy, records=None):
+        """Async version of Pipedream._iter_streamed.
+
+        JSONArrayStream pulls the chunks it decodes, so it runs in the
+        default executor, reading the response through the loop, while
+        the records it yields are handed back in batches.
+        """
+        loop = asyncio.get_event_loop()
+        seen = 0
+        cursor = None
+
+        while True:
+            response = await self._request(method, url, params, json, data,
+                                           headers, retry_policy,
+                                           stream=True)
+            raw = response.raw
+            try:
+                if raw is None:
+                    # A 422 answer, read as it isn't a success
+                    entries = JSONArrayStream([response.content])
+                else:
+                    entries = JSONArrayStream(_read_chunks(raw, loop))
+                iterator = iter(entries)
+                count = 0
+                while True:
+                    try:
+                        batch = await loop.run_in_executor(
+                            None, _take, iterator, STREAM_BATCH)
+                    except asyncio.TimeoutError as e:
+                        raise requests.Timeout(e)
+                    except aiohttp.ClientError as e:
+                        raise requests.ConnectionError(e)
+                    if not batch:
+                        break
+                    count += len(batch)
+                    for entry in batch:
+                        if records is not None and isinstance(entry, dict):
+                            entry = records.from_dict(entry)
+                        yield entry
+                    batch = None
+            finally:
+                if raw is not None:
+                    raw.release()
+
+            page_info = entries.rest.get('page_info')
+            if not isinstance(page_info, dict):
+                return
+
+            seen, cursor = _cursor_after(page_info, count, cursor, seen)
+            if cursor is None:
+                return
+
+            params = dict(params or {})
+            params['after'] = cursor
+
+    async def _coalesced_request(self, method, url, params, json, data,
+                                 headers, retry_policy):
+        """Share a single request between the coroutines making the same
+        GET request at the same time.
+        """
+        key = _flight_key(url, params, headers, retry_policy)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._request(
+                method, url, params, json, data, headers, retry_policy))
+            self._in_flight[key] = future
+            future.add_done_callback(
+                lambda f: self._in_flight.pop(key, None))
+        # A cancelled caller doesn't cancel the request of the others
+        return await asyncio.shield(future)
+
+    async def _request(self, method, url, params, json, data, headers,
+                       retry_policy, stream=False):
+        session = await self._session()
+        if retry_policy.budget is not None:
+            retry_policy.budget.deposit()
+        request_count = 0
+        hooks = self._hooks
+
+        while True:
+            request_count += 1
+            response = None
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await self._sleep('rate_limiter', wait, method, url)
+            if hooks:
+                self._emit('before_request', method=method, url=url,
+                           params=params, headers=headers,
+                           attempt=request_count)
+            try:
+                async with self._semaphore:
+                    if hooks:
+                        start = time.perf_counter()
+                    try:
+                        response = await self._send(session, method, url,
+                                                    params, json, data,
+                                                    headers, stream)
+                    except requests.RequestException as e:
+                        if hooks:
+                            self._emit_response(method, url, request_count,
+                                                None, e, start, data)
+                        raise
+                if hooks:
+                    self._emit_response(method, url, request_count,
+                                        response, None, start, data, stream)
+                _check_response(response)
+                return response
+            except (PipedreamError, requests.RequestException) as e:
+                retry_after = self._retry_delay(response, retry_policy,
+                                                method, request_count)
+                if hooks:
+                    self._emit('on_retry', method=method, url=url,
+                               attempt=request_count, response=response,
+                               error=e, delay=retry_after)
+
+            if retry_after:
+                await self._sleep('retry', retry_after, method, url)
+
+    async def _sleep(self, reason, seconds, method=None, url=None):
+        if self._hooks:
+            self._emit('on_sleep', reason=reason, seconds=seconds,
+                       method=method, url=url)
+        await asyncio.sleep(seconds)
+
+    async def _send(self, session, method, url, params, json, data, headers,
+                    stream=False):
+        if params:
+            # aiohttp only accepts str, int and float query values, and
+            # rejects bool: send it as str like requests does ('True')
+            params = dict((k, str(v) if isinstance(v, bool) or
+                           not isinstance(v, (int, float)) else v)
+                          for k, v in params.items() if v is not None)
+
+        try:
+            response = await session.request(
+                method, url, params=params or None, json=json,
+                data=data or None, headers=headers, **self._client_args())
+            if stream and 200 <= response.status < 300:
+                # Read and released by _iter_streamed
+                return _AsyncResponse(response.status,
+                                      CaseInsensitiveDict(response.headers),
+                                      None, str(response.url), response)
+            try:
+                content = await response.read()
+            finally:
+                response.release()
+            return _AsyncResponse(response.status,
+                                  CaseInsensitiveDict(response.headers),
+                                  content, str(response.url))
+        except asyncio.TimeoutError as e:
+            # Map transport errors to their requests counterparts so that
+            # retry_on behaves the same as with Pipedream.
+            raise requests.Timeout(e)
+        except aiohttp.ClientError as e:
+            raise requests.ConnectionError(e)
@@ -0,0 +1,129 @@
+import os
+import struct
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Token bucket limiting the rate of requests made by Pipedream clients.
+
+    The bucket holds up to burst tokens and is refilled with rate tokens
+    every per seconds. Every request takes a token, waiting for one to be
+    available if the bucket is empty, so the request rate never exceeds
+    the quota and 429 responses are avoided rather than retried.
+
+    A RateLimiter is thread safe. Share one instance between all clients
+    and threads that count against the same quota:
+
+        limiter = RateLimiter(10, per=1, burst=20)
+        z = Pipedream(token, rate_limiter=limiter)
+
+    See FileRateLimiter to share the quota between processes.
+    """
+
+    def __init__(self, rate, per=1.0, burst=None):
+        """
+        Parameters:
+        rate - Number of requests allowed every per seconds.
+        per - Length of the period in seconds. Defaults to 1.
+        burst - Number of requests that can be made at once after the
+            limiter was idle. Defaults to rate.
+        """
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate and per must be positive")
+
+        self.rate = float(rate)
+        self.per = float(per)
+        self.burst = float(burst if burst is not None else rate)
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = self._clock()
+
+    def _clock(self):
+        return time.monotonic()
+
+    def _take(self, tokens, updated, now):
+        """Take a token from a bucket holding tokens at time updated.
+
+        Returns the number of tokens left, which is negative when the
+        token was reserved ahead of time, and how long to wait for it.
+        """
+        tokens = min(self.burst,
+                     tokens + (now - updated) * self.rate / self.per)
+        tokens -= 1
+        if tokens >= 0:
+            return tokens, 0.0
+        return tokens, -tokens * self.per / self.rate
+
+    def reserve(self):
+        """Take a token and return the number of seconds to wait before
+        the request may be made.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens, wait = self._take(self._tokens, self._updated, now)
+            self._updated = now
+        return wait
+
+    def acquire(self):
+        """Take a token, sleeping until the request may be made.
+
+        Returns the number of seconds slept.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class FileRateLimiter(RateLimiter):
+    """Token bucket shared between processes through a local state file.
+
+    All processes using the same path share a single bucket. The state is
+    kept in a few bytes of the file and updated under an exclusive fcntl
+    lock, so the limiter is only available on POSIX systems. The file is
+    created if it doesn't exist.
+
+        limiter = FileRateLimiter('/tmp/pipedream.bucket', 600, per=60)
+    """
+
+    _state = struct.Struct('=dd')
+
+    def __init__(self, path, rate, per=1.0, burst=None):
+        """
+        Parameters:
+        path - Path of the state file.
+        rate, per, burst - See RateLimiter.
+        """
+        import fcntl
+        self._fcntl = fcntl
+
+        super(FileRateLimiter, self).__init__(rate, per=per, burst=burst)
+        self.path = path
+
+    def _clock(self):
+        # Wall clock time is comparable between processes
+        return time.time()
+
+    def reserve(self):
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+                now = self._clock()
+                state = os.read(fd, self._state.size)
+                if len(state) == self._state.size:
+                    tokens, updated = self._state.unpack(state)
+                else:
+                    tokens, updated = self.burst, now
+
+                tokens, wait = self._take(tokens, updated, now)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, self._state.pack(tokens, now))
+            finally:
+                # Closing the file releases the lock
+                os.close(fd)
+        return wait
@@ -0,0 +1,324 @@
+import collections
+
+from .pipedreamer import _check_client, _page_items
+
+Subscription = collections.namedtuple(
+    'Subscription', ['emitter_id', 'listener_id', 'event_name'])
+Subscription.__new__.__defaults__ = (None, )
+
+Webhook = collections.namedtuple('Webhook', ['url', 'name', 'description'])
+Webhook.__new__.__defaults__ = (None, None)
+
+# action is 'create' or 'delete', item a Subscription or Webhook, id the id
+# of the deleted resource, result the response of the API call and error
+# the exception it raised
+Change = collections.namedtuple('Change', ['action', 'item', 'id', 'result',
+                                           'error'])
+
+
+def list_records(client, endpoint, *args):
+    """Iterate over the records of a list endpoint (bound API method or
+    its name), following the pages of the paginated ones.
+    """
+    for page in client.iter_pages(endpoint, *args):
+        items = _page_items(page)
+        if items is None and isinstance(page, dict):
+            # Lists which aren't paginated
+            items = page.get('data')
+        for item in items or ():
+            yield item
+
+
+def subscription(value):
+    """Return value (Subscription, dict or tuple) as a Subscription.
+
+    The default event name (None or '') is normalized to None.
+    """
+    if isinstance(value, dict):
+        value = Subscription(value['emitter_id'], value['listener_id'],
+                             value.get('event_name'))
+    elif not isinstance(value, Subscription):
+        value = Subscription(*value)
+    if not value.event_name and value.event_name is not None:
+        value = value._replace(event_name=None)
+    return value
+
+
+def webhook(value):
+    """Return value (Webhook, dict, tuple or URL) as a Webhook."""
+    if isinstance(value, dict):
+        return Webhook(value['url'], value.get('name'),
+                       value.get('description'))
+    if isinstance(value, Webhook):
+        return value
+    if isinstance(value, str):
+        return Webhook(value)
+    return Webhook(*value)
+
+
+class Plan(object):
+    """Changes bringing the current state to the desired one.
+
+    create - Items to create, in the order they were desired.
+    delete - (item, id) of the resources to delete: the undesired ones
+        and the duplicates of the ones kept.
+    unchanged - Desired items which already exist.
+    """
+
+    def __init__(self, create, delete, unchanged):
+        self.create = create
+        self.delete = delete
+        self.unchanged = unchanged
+
+    def __len__(self):
+        """Number of changes."""
+        return len(self.create) + len(self.delete)
+
+    def __repr__(self):
+        return '<Plan create=%d delete=%d unchanged=%d>' % (
+            len(self.create), len(self.delete), len(self.unchanged))
+
+
+class ReconcileReport(object):
+    """What a reconciliation changed, or would have with dry_run.
+
+    changes - Change of every create and delete, in completion order.
+    unchanged - Desired items which already existed.
+    """
+
+    def __init__(self, changes, unchanged, dry_run=False):
+        self.changes = changes
+        self.unchanged = unchanged
+        self.dry_run = dry_run
+
+    def _items(self, action):
+        return [c.item for c in self.changes
+                if c.action == action and c.error is None]
+
+    @property
+    def created(self):
+        return self._items('create')
+
+    @property
+    def deleted(self):
+        return self._items('delete')
+
+    @property
+    def failed(self):
+        return [c for c in self.changes if c.error is not None]
+
+    def __repr__(self):
+        return '<ReconcileReport created=%d deleted=%d failed=%d ' \
+            'unchanged=%d%s>' % (len(self.created), len(self.deleted),
+                                 len(self.failed), len(self.unchanged),
+                                 ' dry_run' if self.dry_run else '')
+
+    def to_dict(self):
+        """Return the report as a JSON serializable dict."""
+        return {
+            'dry_run': self.dry_run,
+            'created': [c.item._asdict() for c in self.changes
+                        if c.action == 'create' and c.error is None],
+            'deleted': [dict(c.item._asdict(), id=c.id)
+                        for c in self.changes
+                        if c.action == 'delete' and c.error is None],
+            'failed': [dict(c.item._asdict(), action=c.action, id=c.id,
+                            error=str(c.error))
+                       for c in self.failed],
+            'unchanged': len(self.unchanged),
+        }
+
+
+def diff(desired, current, key, prune=True, duplicates=True):
+    """Compute the Plan bringing current to desired.
+
+    Parameters:
+    desired - Iterable of desired items, duplicates are ignored.
+    current - Iterable of (item, id) of the existing resources.
+    key - Function returning the identity of an item: items of the same
+        key are the same resource.
+    prune - Delete the resources which aren't desired. Defaults to True.
+    duplicates - Delete the duplicates of the resources kept. Defaults to
+        True.
+    """
+    existing = {}
+    delete = []
+    for item, id in current:
+        k = key(item)
+        if k not in existing:
+            existing[k] = (item, id)
+        elif duplicates:
+            delete.append((item, id))
+
+    create = []
+    unchanged = []
+    wanted = set()
+    for item in desired:
+        k = key(item)
+        if k in wanted:
+            continue
+        wanted.add(k)
+        if k in existing:
+            unchanged.append(item)
+        else:
+            create.append(item)
+
+    if prune:
+        delete.extend(found for k, found in existing.items()
+                      if k not in wanted)
+    else:
+        # Only the duplicates of the resources kept
+        delete = [(item, id) for item, id in delete if key(item) in wanted]
+    return Plan(create, delete, unchanged)
+
+
+class Reconciler(object):
+    """Declarative management of subscriptions and webhooks.
+
+    Given the subscriptions (or webhooks) which should exist, fetches the
+    existing ones once through the list endpoint, computes the minimal set
+    of changes with set lookups and applies it with concurrent calls
+    through Pipedream.map(), which counts them against the rate limiter
+    of the client and pauses on rate limit errors.
+
+    Subscriptions are identified by (emitter_id, listener_id, event_name)
+    and webhooks by their URL: the name and description of a webhook are
+    only used when it is created. Duplicate webhooks are deleted.
+
+    Example:
+        r = Reconciler(z, concurrency=8)
+        report = r.reconcile_subscriptions([
+            {'emitter_id': 'dc_abc', 'listener_id': 'p_xyz'},
+            ('dc_def', 'p_xyz', 'custom'),
+        ])
+        for change in report.failed:
+            print(change.action, change.item, change.error)
+    """
+
+    def __init__(self, client, concurrency=4, org_id=None):
+        """
+        Parameters:
+        client - Pipedream client. Size its pool_maxsize for concurrency.
+        concurrency - Number of changes applied at once. Defaults to 4.
+        org_id - Manage the subscriptions of this organization instead of
+            the user's.
+        """
+        _check_client(client, "Reconciler")
+        self.client = client
+        self.concurrency = concurrency
+        self.org_id = org_id
+
+    def current_subscriptions(self):
+        """Return [(Subscription, id)] of the existing subscriptions."""
+        if self.org_id is None:
+            records = list_records(self.client, 'users_me_subscriptions')
+        else:
+            records = list_records(self.client, 'orgs_subscriptions_list',
+                                   self.org_id)
+        return [(subscription(r), r.get('id')) for r in records]
+
+    def current_webhooks(self):
+        """Return [(Webhook, id)] of the existing webhooks."""
+        return [(webhook(r), r.get('id'))
+                for r in list_records(self.client, 'users_me_webhooks')]
+
+    def plan_subscriptions(self, desired, prune=True):
+        """Return the Plan bringing the subscriptions to desired.
+
+        Parameters:
+        desired - Iterable of Subscription, dicts or
+            (emitter_id, listener_id[, event_name]) tuples.
+        prune - Delete the subscriptions which aren't desired. Defaults to
+            True.
+        """
+        # Subscriptions are deleted by (emitter_id, listener_id,
+        # event_name), deleting a duplicate would delete them all
+        return diff((subscription(s) for s in desired),
+                    self.current_subscriptions(), key=lambda s: s,
+                    prune=prune, duplicates=False)
+
+    def plan_webhooks(self, desired, prune=True):
+        """Return the Plan bringing the webhooks to desired.
+
+        Parameters:
+        desired - Iterable of Webhook, dicts with a url key, (url, name,
+            description) tuples or URLs.
+        prune - Delete the webhooks which aren't desired. Defaults to
+            True, with False only the duplicates of desired webhooks are.
+        """
+        return diff((webhook(w) for w in desired), self.current_webhooks(),
+                    key=lambda w: w.url, prune=prune)
+
+    def reconcile_subscriptions(self, desired, prune=True, dry_run=False):
+        """Create and delete subscriptions so that exactly the desired ones
+        exist. See plan_subscriptions() for the parameters.
+
+        dry_run - Only report what would change.
+
+        Returns: ReconcileReport
+        """
+        return self.apply(self.plan_subscriptions(desired, prune),
+                          self._create_subscription,
+                          self._delete_subscription, dry_run)
+
+    def reconcile_webhooks(self, desired, prune=True, dry_run=False):
+        """Create and delete webhooks so that exactly the desired ones
+        exist. See plan_webhooks() for the parameters.
+
+        dry_run - Only report what would change.
+
+        Returns: ReconcileReport
+        """
+        return self.apply(self.plan_webhooks(desired, prune),
+                          self._create_webhook, self._delete_webhook,
+                          dry_run)
+
+    def apply(self, plan, create, delete, dry_run=False):
+        """Apply a Plan concurrently, calling create(item) and
+        delete((item, id)) for its changes.
+
+        Returns: ReconcileReport
+        """
+        if dry_run:
+            changes = ([Change('create', item, None, None, None)
+                        for item in plan.create] +
+                       [Change('delete', item, id, None, None)
+                        for item, id in plan.delete])
+            return ReconcileReport(changes, plan.unchanged, dry_run=True)
+
+        tasks = ([(create, item) for item in plan.create] +
+                 [(delete, found) for found in plan.delete])
+        changes = []
+        for r in self.client.map(_run_task, tasks,
+                                 concurrency=self.concurrency,
+                                 ordered=False):
+            fn, arg = r.item
+            if fn is create:
+                change = Change('create', arg, None, r.result, r.error)
+            else:
+                change = Change('delete', arg[0], arg[1], r.result, r.error)
+            changes.append(change)
+        return ReconcileReport(changes, plan.unchanged)
+
+    def _create_subscription(self, s):
+        return self.client.subscription_create(
+            None, emitter_id=s.emitter_id, listener_id=s.listener_id,
+            event_name=s.event_name)
+
+    def _delete_subscription(self, found):
+        s = found[0]
+        return self.client.subscriptions_delete(
+            emitter_id=s.emitter_id, listener_id=s.listener_id,
+            event_name=s.event_name)
+
+    def _create_webhook(self, w):
+        return self.client.webhook_create(None, url=w.url, name=w.name,
+                                          description=w.description)
+
+    def _delete_webhook(self, found):
+        return self.client.webhook_delete(found[1])
+
+
+def _run_task(task):
+    fn, arg = task
+    return fn(arg)
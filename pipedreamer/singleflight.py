@@ -0,0 +1,66 @@
+import threading
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        # Held by the caller running the call, cheaper than an Event
+        self.done = threading.Lock()
+        self.done.acquire()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Run a function once for all the concurrent callers asking for the
+    same key.
+
+    The first caller for a key runs the function while the ones arriving
+    before it returns wait for it and get the same result, or the same
+    exception raised. Nothing is remembered once the call is over, a
+    later caller runs the function again.
+
+    SingleFlight is thread safe.
+
+        flights = SingleFlight()
+        user = flights.do('users/me', z.users_me)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        """Number of calls in flight."""
+        return len(self._calls)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing the call with the other
+        callers of the same key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            with call.done:
+                pass
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.release()
+        return call.result
@@ -0,0 +1,561 @@
+import contextlib
+import functools
+import socket
+import threading
+import time
+from concurrent import futures
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import (check_header_validity, requote_uri,
+                            to_native_string)
+from urllib3 import connectionpool
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import HTTPError
+
+# Imported by HTTPXTransport, see _import_httpx
+httpx = None
+
+# client_args the prepared request fast path handles, see RequestsTransport
+FAST_CLIENT_ARGS = frozenset(['timeout', 'allow_redirects', 'verify', 'cert'])
+
+
+def _import_httpx():
+    """Import httpx on first use, it takes longer to import than the rest
+    of the package.
+    """
+    global httpx
+    if httpx is None:
+        try:
+            import httpx as module
+        except ImportError:
+            raise ImportError("HTTPXTransport requires the httpx package")
+        httpx = module
+    return httpx
+
+
+# Process wide adapters of the RequestsTransports sharing connections
+_shared_adapters = {}
+_shared_lock = threading.Lock()
+
+def _encode_query(params):
+    """Encode the query params dict as requests does."""
+    items = []
+    for key, values in params.items():
+        if isinstance(values, (str, bytes)) or \
+                not hasattr(values, '__iter__'):
+            values = [values]
+        for value in values:
+            if value is not None:
+                items.append((key, value))
+    return urlencode(items, doseq=True)
+
+
+def _keepalive_options(keepalive):
+    """Socket options enabling TCP keep-alive probes after keepalive
+    seconds of inactivity, where the platform allows setting it.
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    idle = getattr(socket, 'TCP_KEEPIDLE', None)
+    if idle is None:
+        # macOS
+        idle = getattr(socket, 'TCP_KEEPALIVE', None)
+    if idle is not None:
+        options.append((socket.IPPROTO_TCP, idle, int(keepalive)))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL,
+                        max(1, int(keepalive) // 3)))
+    return options
+
+
+class _IdleTimeoutPool(object):
+    """Connection pool mixin closing the connections which have been idle
+    for more than idle_timeout seconds instead of reusing them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.idle_timeout = kwargs.pop('idle_timeout')
+        super(_IdleTimeoutPool, self).__init__(*args, **kwargs)
+
+    def _get_conn(self, timeout=None):
+        conn = super(_IdleTimeoutPool, self)._get_conn(timeout)
+        released = getattr(conn, '_pipedreamer_released', None)
+        if released is not None and \
+                time.monotonic() - released > self.idle_timeout:
+            # Reconnects on its next request
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._pipedreamer_released = time.monotonic()
+        super(_IdleTimeoutPool, self)._put_conn(conn)
+
+
+class _IdleTimeoutHTTPPool(_IdleTimeoutPool,
+                           connectionpool.HTTPConnectionPool):
+    pass
+
+
+class _IdleTimeoutHTTPSPool(_IdleTimeoutPool,
+                            connectionpool.HTTPSConnectionPool):
+    pass
+
+
+class KeepAliveAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive and an idle timeout.
+
+    Keep-alive probes let the operating system notice connections dropped
+    by a NAT or a load balancer while they are idle in the pool. The idle
+    timeout retires connections before the server closes them on its
+    side, which would otherwise fail the request that reuses them first
+    (set it below the keep-alive timeout of the server).
+    """
+
+    __attrs__ = requests.adapters.HTTPAdapter.__attrs__ + [
+        'keepalive', 'idle_timeout']
+
+    def __init__(self, keepalive=None, idle_timeout=None, **kwargs):
+        """
+        Parameters:
+        keepalive - Seconds of inactivity after which TCP keep-alive
+            probes are sent. Defaults to None (no probes).
+        idle_timeout - Seconds a connection may stay idle in the pool and
+            still be reused. Defaults to None (no limit).
+        **kwargs - Passed to HTTPAdapter, e.g. pool_maxsize.
+        """
+        # HTTPAdapter.__init__ creates the pool manager
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        super(KeepAliveAdapter, self).__init__(**kwargs)
+
+    def _pool_kwargs(self, kwargs):
+        if self.keepalive is not None:
+            kwargs.setdefault('socket_options', list(
+                HTTPConnection.default_socket_options) +
+                _keepalive_options(self.keepalive))
+        return kwargs
+
+    def _set_pool_classes(self, manager):
+        if self.idle_timeout is not None:
+            manager.pool_classes_by_scheme = {
+                'http': functools.partial(_IdleTimeoutHTTPPool,
+                                          idle_timeout=self.idle_timeout),
+                'https': functools.partial(_IdleTimeoutHTTPSPool,
+                                           idle_timeout=self.idle_timeout),
+            }
+        return manager
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        super(KeepAliveAdapter, self).init_poolmanager(
+            connections, maxsize, block, **self._pool_kwargs(pool_kwargs))
+        self._set_pool_classes(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        return self._set_pool_classes(
+            super(KeepAliveAdapter, self).proxy_manager_for(
+                proxy, **self._pool_kwargs(proxy_kwargs)))
+
+
+def _connect_all(connect, count):
+    """Call connect() count times, concurrently."""
+    if count <= 1:
+        for _ in range(count):
+            connect()
+        return
+    with futures.ThreadPoolExecutor(count) as pool:
+        for future in [pool.submit(connect) for _ in range(count)]:
+            future.result()
+
+
+class RequestsTransport(object):
+    """Transport sending requests with a requests.Session, over HTTP/1.1.
+
+    This is the default transport of Pipedream. Transports only have to
+    implement request() and close(); request() takes the arguments of
+    requests.Session.request and returns a requests.Response, raising
+    requests exceptions.
+
+    Requests are sent through a prepared request fast path, minus the work
+    requests repeats for every request although its result rarely
+    changes: the session headers and hooks are prepared once into a
+    template PreparedRequest, which the headers of each request are
+    applied to, URLs are only parsed and normalized once, and the proxies
+    and CA bundle of the environment are looked up once per host
+    (scanning the environment for proxy settings alone is most of
+    requests' overhead).
+
+    Requests the template can't express exactly (file uploads, session
+    cookies, auth or params, anonymous requests which may use .netrc,
+    arguments beyond FAST_CLIENT_ARGS) go through Session.request().
+
+    With shared=True, the transports created with the same pool settings
+    share one KeepAliveAdapter, and so its connections: a client created
+    after another one reuses the connections (and their TLS sessions) the
+    first one opened instead of making its own TCP and TLS handshakes.
+    """
+
+    def __init__(self, session=None, pool_connections=10, pool_maxsize=10,
+                 keepalive=None, idle_timeout=None, shared=False):
+        """
+        Parameters:
+        session - requests.Session, or any object with its request()
+            method. Defaults to a new session with a KeepAliveAdapter
+            configured by the other parameters.
+        pool_connections - Number of connection pools (one per host) to
+            cache. Defaults to 10.
+        pool_maxsize - Maximum number of connections kept open per host.
+            Defaults to 10.
+        keepalive - Seconds of inactivity after which TCP keep-alive
+            probes are sent. Defaults to None (no probes).
+        idle_timeout - Seconds an idle connection may be reused.
+            Defaults to None (no limit).
+        shared - Share the connections with the other shared transports
+            of the process. Defaults to False.
+        """
+        self.shared = shared
+        if session is None:
+            session = requests.Session()
+            if shared:
+                key = (pool_connections, pool_maxsize, keepalive,
+                       idle_timeout)
+                with _shared_lock:
+                    adapter = _shared_adapters.get(key)
+                    if adapter is None:
+                        adapter = _shared_adapters[key] = KeepAliveAdapter(
+                            keepalive, idle_timeout,
+                            pool_connections=pool_connections,
+                            pool_maxsize=pool_maxsize)
+            else:
+                adapter = KeepAliveAdapter(keepalive, idle_timeout,
+                                           pool_connections=pool_connections,
+                                           pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self._templates = {}
+        self._settings = {}
+        self._urls = {}
+
+    def close(self):
+        # The connections of a shared adapter outlive its transports
+        if not self.shared:
+            self.session.close()
+
+    def warm(self, url, connections=1, proxies=None, verify=None, cert=None,
+             timeout=None, **kwargs):
+        """Open connections to the host of url and leave them in the
+        pool, so that the next requests don't wait for DNS, TCP and TLS.
+
+        Parameters:
+        url - URL of the host to connect to.
+        connections - Number of connections to open, concurrently.
+            Capped by pool_maxsize. Defaults to 1.
+        proxies, verify, cert, timeout - As for requests, the connections
+            are opened for requests made with the same settings.
+
+        Returns: number of connections opened.
+        """
+        session = self.session
+        settings = session.merge_environment_settings(
+            url, proxies or {}, None, verify, cert)
+        adapter = session.get_adapter(url)
+        request = requests.Request('GET', url).prepare()
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            pool = adapter.get_connection_with_tls_context(
+                request, settings['verify'], settings['proxies'],
+                settings['cert'])
+        else:
+            pool = adapter.get_connection(url, settings['proxies'])
+        adapter.cert_verify(pool, url, settings['verify'], settings['cert'])
+
+        if isinstance(timeout, tuple):
+            timeout = timeout[0]
+        count = min(connections, pool.pool.maxsize)
+        # Take all the connections first, so that each thread gets its own
+        conns = [pool._get_conn() for _ in range(count)]
+        opened = []
+
+        def connect():
+            conn = conns.pop()
+            try:
+                if conn.sock is None:
+                    if timeout is not None:
+                        conn.timeout = timeout
+                    conn.connect()
+                    opened.append(conn)
+            except (OSError, HTTPError) as e:
+                conn.close()
+                raise requests.ConnectionError(e)
+            finally:
+                pool._put_conn(conn)
+
+        _connect_all(connect, count)
+        return len(opened)
+
+    def request(self, method, url, params=None, json=None, data=None,
+                files=None, headers=None, stream=False, **kwargs):
+        session = self.session
+        headers = headers or {}
+        if (files or type(session) is not requests.Session or
+                session.cookies or session.auth or session.params or
+                'Authorization' not in headers or
+                not FAST_CLIENT_ARGS.issuperset(kwargs)):
+            return session.request(method, url, params=params, json=json,
+                                   data=data, headers=headers, files=files,
+                                   stream=stream, **kwargs)
+
+        # Keyed on the session headers only: the headers of the call vary
+        # (request ids, ETags...) and are applied to the copy
+        key = (method, tuple(session.headers.items()))
+        template = self._templates.get(key)
+        if template is None:
+            template = requests.PreparedRequest()
+            template.prepare_method(method)
+            template.prepare_headers(requests.sessions.merge_setting(
+                {}, session.headers, dict_class=CaseInsensitiveDict))
+            template.prepare_hooks(
+                requests.sessions.merge_hooks({}, session.hooks))
+            if len(self._templates) >= 64:
+                self._templates.clear()
+            self._templates[key] = template
+
+        request = template.copy()
+        request_headers = request.headers
+        for name, value in headers.items():
+            # As merge_setting and prepare_headers do
+            if value is None:
+                request_headers.pop(name, None)
+            else:
+                check_header_validity((name, value))
+                request_headers[to_native_string(name)] = value
+        request.url = self._prepared_url(url, params)
+        request.prepare_body(data, None, json)
+
+        verify = kwargs.get('verify')
+        cert = kwargs.get('cert')
+        end = url.find('/', url.find('//') + 2)
+        origin = url[:end] if end > 0 else url
+        settings_key = (origin, verify, cert)
+        settings = self._settings.get(settings_key)
+        if settings is None:
+            settings = session.merge_environment_settings(
+                origin + '/', {}, None, verify, cert)
+            self._settings[settings_key] = settings
+
+        return session.send(request, stream=stream,
+                            timeout=kwargs.get('timeout'),
+                            allow_redirects=kwargs.get('allow_redirects',
+                                                       True),
+                            proxies=settings['proxies'],
+                            verify=settings['verify'], cert=settings['cert'])
+
+    def _prepared_url(self, url, params):
+        """Return url with the query params, as PreparedRequest.prepare_url
+        would, but parsing and normalizing url only once.
+        """
+        base = self._urls.get(url)
+        if base is None:
+            request = requests.PreparedRequest()
+            request.prepare_url(url, None)
+            base = request.url
+            if len(self._urls) >= 1024:
+                # URLs hold ids, don't let them pile up
+                self._urls.clear()
+            self._urls[url] = base
+
+        if not params:
+            return base
+        if not isinstance(params, dict):
+            request = requests.PreparedRequest()
+            request.prepare_url(url, params)
+            return request.url
+
+        query = _encode_query(params)
+        if not query:
+            return base
+        return requote_uri('%s%s%s' % (base, '&' if '?' in base else '?',
+                                       query))
+
+
+class _HTTPXStream(object):
+    """Body of a streamed httpx response, as the raw attribute of the
+    requests.Response wrapping it.
+    """
+
+    def __init__(self, response):
+        self._response = response
+
+    def stream(self, chunk_size, decode_content=True):
+        with _httpx_errors():
+            for chunk in self._response.iter_bytes(chunk_size):
+                yield chunk
+
+    def read(self, amt=None):
+        return b''.join(self.stream(amt))
+
+    def close(self):
+        self._response.close()
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    """Raise the requests counterparts of httpx exceptions."""
+    try:
+        yield
+    except httpx.ConnectTimeout as e:
+        raise requests.ConnectTimeout(e)
+    except httpx.ReadTimeout as e:
+        raise requests.ReadTimeout(e)
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(e)
+    except httpx.TooManyRedirects as e:
+        raise requests.TooManyRedirects(e)
+    except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+        raise requests.exceptions.InvalidURL(e)
+    except httpx.TransportError as e:
+        raise requests.ConnectionError(e)
+    except httpx.StreamError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+
+
+class HTTPXTransport(object):
+    """Transport sending requests with httpx, over HTTP/2 by default.
+
+    HTTP/2 multiplexes concurrent requests over a single connection per
+    host instead of opening one TCP and TLS connection per request in
+    flight, which matters when many threads share a client:
+
+        z = Pipedream(token, transport=HTTPXTransport())
+        for r in z.map(z.source_event_summaries, source_ids,
+                       concurrency=32):
+            ...
+
+    Servers which don't offer HTTP/2 are spoken to over HTTP/1.1.
+    Responses are returned as requests.Response and httpx exceptions
+    raised as their requests counterparts, so that retry_on, hooks and
+    the rest of the client behave the same as with RequestsTransport.
+
+    Requires the httpx package, and h2 for HTTP/2:
+    pip install pipedreamer[http2]
+    """
+
+    def __init__(self, http2=True, max_connections=100,
+                 max_keepalive_connections=20, keepalive_expiry=5.0,
+                 **client_kwargs):
+        """
+        Parameters:
+        http2 - Offer HTTP/2. Defaults to True.
+        max_connections - Maximum number of connections open at once.
+            Defaults to 100.
+        max_keepalive_connections - Maximum number of idle connections
+            kept open. Defaults to 20.
+        keepalive_expiry - Seconds an idle connection is kept open.
+            Defaults to 5.
+        **client_kwargs - Passed to httpx.Client, e.g. proxy.
+
+        The verify and cert client_args of Pipedream apply to the httpx
+        client when it is created, on the first request.
+        """
+        _import_httpx()
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry)
+        self.client_kwargs = client_kwargs
+        self.client = None
+        self._lock = threading.Lock()
+
+    def _client(self, verify, cert):
+        if self.client is None:
+            with self._lock:
+                if self.client is None:
+                    kwargs = dict(self.client_kwargs)
+                    if verify is not None:
+                        kwargs.setdefault('verify', verify)
+                    if cert is not None:
+                        kwargs.setdefault('cert', cert)
+                    self.client = httpx.Client(http2=self.http2,
+                                               limits=self.limits, **kwargs)
+        return self.client
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def warm(self, url, connections=1, timeout=None, verify=None, cert=None,
+             **kwargs):
+        """Open connections to the host of url, as
+        RequestsTransport.warm(). httpx has no API to only connect, a HEAD
+        request is made on each connection instead. A single one is opened
+        with HTTP/2, which needs no more.
+
+        Returns: number of requests made.
+        """
+        count = 1 if self.http2 else connections
+
+        def connect():
+            self.request('HEAD', url, timeout=timeout, verify=verify,
+                         cert=cert, allow_redirects=False)
+
+        _connect_all(connect, count)
+        return count
+
+    def request(self, method, url, params=None, json=None, data=None,
+                files=None, headers=None, stream=False, timeout=None,
+                allow_redirects=True, verify=None, cert=None):
+        client = self._client(verify, cert)
+
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            # No timeout by default, as with requests
+            timeout = httpx.Timeout(timeout)
+
+        kwargs = {'headers': headers, 'json': json, 'timeout': timeout}
+        if params:
+            kwargs['params'] = dict((k, v) for k, v in params.items()
+                                    if v is not None)
+        if isinstance(data, (bytes, str)):
+            kwargs['content'] = data
+        elif data:
+            kwargs['data'] = data
+        if files:
+            kwargs['files'] = files
+
+        with _httpx_errors():
+            request = client.build_request(method, url, **kwargs)
+            response = client.send(request, stream=stream,
+                                   follow_redirects=allow_redirects)
+        return self._response(response, stream)
+
+    def _response(self, response, stream):
+        """Wrap an httpx response into a requests.Response."""
+        request = requests.PreparedRequest()
+        request.method = response.request.method
+        request.url = str(response.request.url)
+        request.headers = CaseInsensitiveDict(response.request.headers)
+        try:
+            request.body = response.request.content or None
+        except httpx.RequestNotRead:
+            # Streamed upload
+            request.body = None
+
+        wrapped = requests.Response()
+        wrapped.status_code = response.status_code
+        wrapped.reason = response.reason_phrase
+        wrapped.headers = CaseInsensitiveDict(response.headers)
+        wrapped.url = str(response.url)
+        wrapped.request = request
+        if stream:
+            wrapped.raw = _HTTPXStream(response)
+        else:
+            wrapped._content = response.content
+            wrapped.elapsed = response.elapsed
+        return wrapped
@@ -9,7 +9,17 @@ setup(
     author_email = 'brent@fprimex.com',
     packages = ['pipedreamer'],
     include_package_data = True,
-    install_requires = ['requests', 'six'],
+    python_requires = '>=3.7',
+    install_requires = ['requests'],
+    extras_require = {
+        'async': ['aiohttp'],
+        'http2': ['httpx[http2]'],
+    },
+    entry_points = {
+        'console_scripts': [
+            'pipedream-export = pipedreamer.export:main',
+        ],
+    },
     setup_requires = [],
     tests_require = [],
     license='LICENSE.txt',
@@ -22,7 +32,6 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Internet',
-        'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 3',
     ],
 )
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+from pipedreamer import AsyncPipedream, Pipedream  # noqa: E402
+from pipedreamer.reconcile import Reconciler  # noqa: E402
+from pipedreamer.sync import EventSync, FileCheckpointStore  # noqa: E402
+from pipedreamer.records import EventSummary  # noqa: E402
+
+# Newest first, like the API
+EVENTS = [{'id': 'e%03d' % i, 'indexed_at_ms': 1000 + i,
+           'event': {'n': i, 'text': u'caf\xe9 "%d"' % i}}
+          for i in reversed(range(250))]
+
+
+async def event_summaries(request):
+    limit = int(request.query.get('limit', 100))
+    start = int(request.query.get('after', 0))
+    data = EVENTS[start:start + limit]
+    return web.json_response({
+        'page_info': {'total_count': len(EVENTS), 'count': len(data),
+                      'start_cursor': str(start),
+                      'end_cursor': str(start + len(data))},
+        'data': data,
+    })
+
+
+def run(test, **kwargs):
+    """Run test(client) against a local server."""
+    async def main():
+        app = web.Application()
+        app.router.add_get('/v1/sources/{id}/event_summaries',
+                           event_summaries)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncPipedream(
+                    'token', base_url='http://127.0.0.1:%d/v1' % port,
+                    **kwargs) as z:
+                return await test(z)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_get_all_pages():
+    async def test(z):
+        return await z.source_event_summaries('dc_a', get_all_pages=True)
+    page = run(test)
+    assert page['data'] == EVENTS
+    assert page['page_info']['count'] == len(EVENTS)
+
+
+def test_stream():
+    async def test(z):
+        items = await z.source_event_summaries('dc_a', stream=True,
+                                               limit=30)
+        return [item async for item in items]
+    assert run(test) == EVENTS
+
+
+def test_iter_items():
+    async def test(z):
+        return ([e async for e in z.iter_items(
+                    z.source_event_summaries, 'dc_a', limit=40)],
+                [e async for e in z.iter_items(
+                    'source_event_summaries', 'dc_a', stream=True)])
+    paged, streamed = run(test)
+    assert paged == streamed == EVENTS
+
+
+def test_stream_records():
+    async def test(z):
+        return [e async for e in z.iter_items(
+            'source_event_summaries', 'dc_a', stream=True, records=True)]
+    records = run(test)
+    assert [type(r) for r in records] == [EventSummary] * len(EVENTS)
+    assert [r.to_dict() for r in records] == \
+        [dict(e, metadata=None) for e in EVENTS]
+
+
+def test_stream_early_exit():
+    async def test(z):
+        items = await z.source_event_summaries('dc_a', stream=True)
+        async for first in items:
+            break
+        await items.aclose()
+        page = await z.source_event_summaries('dc_a', limit=2)
+        return first, page['data']
+    first, data = run(test)
+    assert first == EVENTS[0]
+    assert data == EVENTS[:2]
+
+
+def test_not_a_pipedream(tmp_path):
+    z = AsyncPipedream('token')
+    assert not isinstance(z, Pipedream)
+    with pytest.raises(TypeError):
+        EventSync(z, FileCheckpointStore(str(tmp_path)))
+    with pytest.raises(TypeError):
+        Reconciler(z)
+
+
+def test_scalar_timeout():
+    timeout = AsyncPipedream('token', client_args={'timeout': 5}) \
+        ._client_args()['timeout']
+    assert (timeout.total, timeout.sock_connect, timeout.sock_read) == \
+        (None, 5, 5)
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import pytest
+import requests
+
+from pipedreamer import DiskCache, Pipedream, ResponseCache
+from pipedreamer.cache import CacheEntry, cache_key
+
+KEYS = [
+    '/sources/dc_a',
+    '/sources/dc_a/event_summaries?limit=10',
+    '/sources/dc_b',
+    '/users/me/sources',
+    '/users/me/webhooks',
+    '/components/c_1',
+]
+
+
+def entry(content=b'{}'):
+    return CacheEntry(200, {'ETag': '"1"'}, content, time.time())
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return ResponseCache(ttl=60)
+    return DiskCache(str(tmp_path / 'cache'), ttl=60)
+
+
+def cached(cache):
+    return [k for k in KEYS if cache.get(k) is not None]
+
+
+def test_cache_key():
+    assert cache_key('/sources', {'b': 2, 'a': 1, 'c': None}) == \
+        cache_key('/sources', {'a': '1', 'b': '2'}) == '/sources?a=1&b=2'
+    assert cache_key('/sources', None) == '/sources'
+
+
+def test_cache_key_credential():
+    anonymous = cache_key('/sources', {'a': 1})
+    first = cache_key('/sources', {'a': 1}, 'Bearer first')
+    second = cache_key('/sources', {'a': 1}, b'Bearer second')
+    assert len(set([anonymous, first, second])) == 3
+    assert 'first' not in first
+    assert first.startswith('/sources?a=1')
+    assert cache_key('/sources', None, 'Bearer first').startswith('/sources?')
+
+
+def test_get_set(cache):
+    cache.set(KEYS[0], entry(b'{"id": "dc_a"}'))
+    found = cache.get(KEYS[0])
+    assert bytes(found.content) == b'{"id": "dc_a"}'
+    assert found.headers == {'ETag': '"1"'}
+    assert cache.fresh(found)
+    assert not cache.fresh(found._replace(stored_at=time.time() - 120))
+    cache.delete(KEYS[0])
+    assert cache.get(KEYS[0]) is None
+
+
+@pytest.mark.parametrize('path, remaining', [
+    # The resource, what is below it and the lists of its kind
+    ('/sources/dc_a', ['/sources/dc_b', '/users/me/webhooks',
+                       '/components/c_1']),
+    ('/sources/dc_a/', ['/sources/dc_b', '/users/me/webhooks',
+                        '/components/c_1']),
+    ('/webhooks/hook_1', KEYS[:3] + ['/users/me/sources',
+                                     '/components/c_1']),
+    # auto_subscriptions are subscriptions, nothing lists them here
+    ('/auto_subscriptions?x=1', KEYS),
+    ('/sources', ['/users/me/webhooks', '/components/c_1']),
+    ('', []),
+])
+def test_invalidate(cache, path, remaining):
+    for key in KEYS:
+        cache.set(key, entry())
+    cache.invalidate(path)
+    assert cached(cache) == remaining
+
+
+def test_invalidate_credentials(cache):
+    first = cache_key('/sources/dc_a', None, 'Bearer first')
+    second = cache_key('/sources/dc_a', None, 'Bearer second')
+    lists = cache_key('/users/me/sources', {'limit': 2}, 'Bearer second')
+    for key in (first, second, lists):
+        cache.set(key, entry())
+    cache.invalidate('/sources/dc_a')
+    assert [cache.get(k) for k in (first, second, lists)] == [None] * 3
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=10)
+    cache.set('/a', entry(b'1234'))
+    cache.set('/b', entry(b'1234'))
+    cache.get('/a')
+    cache.set('/c', entry(b'1234'))
+    assert [k for k in ('/a', '/b', '/c') if cache.get(k)] == ['/a', '/c']
+    assert cache.size == 8
+    cache.set('/d', entry(b'12345678901'))
+    assert cache.get('/d') is None
+
+
+def test_disk_cache_shared_index(tmp_path):
+    directory = str(tmp_path / 'cache')
+    writer = DiskCache(directory)
+    reader = DiskCache(directory)
+    for key in KEYS:
+        writer.set(key, entry())
+    assert bytes(reader.open(KEYS[0])) == b'{}'
+    reader.invalidate('/sources/dc_b')
+    assert cached(writer) == ['/sources/dc_a',
+                              '/sources/dc_a/event_summaries?limit=10',
+                              '/users/me/webhooks', '/components/c_1']
+
+
+def test_disk_cache_reindexes_old_directories(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = DiskCache(directory)
+    for key in KEYS:
+        cache.set(key, entry())
+    shutil.rmtree(os.path.join(directory, 'index'))
+    cache = DiskCache(directory)
+    cache.invalidate('/components/c_1')
+    assert cached(cache) == KEYS[:5]
+
+
+class CountingTransport(object):
+    """Transport answering every request with its method and path."""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.requests.append((method, url, headers.get('Authorization')))
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(
+            {'method': method, 'auth': headers.get('Authorization'),
+             'n': len(self.requests)}).encode('utf-8')
+        response.url = url
+        return response
+
+    def close(self):
+        pass
+
+
+def test_client_cache():
+    transport = CountingTransport()
+    cache = ResponseCache(ttl=60)
+    first = Pipedream('first', cache=cache, transport=transport)
+    second = Pipedream('second', cache=cache, transport=transport)
+
+    assert first.source_event_summaries('dc_a')['n'] == 1
+    assert first.source_event_summaries('dc_a')['n'] == 1
+    # Never served the response of another credential
+    assert second.source_event_summaries('dc_a') == {'method': 'GET',
+                                         'auth': 'Bearer second', 'n': 2}
+    first.users_me_sources_()
+    assert len(cache) == 3
+
+    first.source_update('dc_a', {'name': 'orders'})
+    assert len(cache) == 0
+    assert second.source_event_summaries('dc_a')['n'] == 5
+
+
+
+def test_disk_cache_directories_created_concurrently(tmp_path,
+                                                     monkeypatch):
+    directory = str(tmp_path / 'cache')
+    cache = DiskCache(directory)
+    isdir = os.path.isdir
+
+    def created_after_check(path):
+        # Another process creates the directory once the cache checked it
+        if sys._getframe(1).f_globals['__name__'] == 'pipedreamer.cache':
+            return False
+        return isdir(path)
+
+    monkeypatch.setattr(os.path, 'isdir', created_after_check)
+    DiskCache(directory).set('/components/c_1', entry())
+    cache.set('/components/c_2', entry())
+    monkeypatch.undo()
+    assert cache.get('/components/c_1') is not None
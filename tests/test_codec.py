@@ -0,0 +1,86 @@
+import json
+
+import pytest
+import requests
+
+from pipedreamer import Pipedream
+from pipedreamer.codec import CODECS, JSONCodec, get_codec
+
+VALUE = {'id': 'e1', 'n': [1, -2, 3.5, True, False, None],
+         'text': u'caf\xe9 ☃ "quoted"', 'nested': {'a': {'b': []}}}
+
+
+def installed():
+    names = []
+    for name in sorted(CODECS):
+        try:
+            CODECS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+@pytest.mark.parametrize('name', installed())
+def test_round_trip(name):
+    codec = get_codec(name)
+    data = codec.dumps(VALUE)
+    assert isinstance(data, bytes)
+    assert json.loads(data.decode('utf-8')) == VALUE
+    assert codec.loads(data) == VALUE
+    assert codec.loads(data.decode('utf-8')) == VALUE
+
+
+@pytest.mark.parametrize('name', installed())
+def test_fallback_to_standard_library(name):
+    codec = get_codec(name)
+    # Non-str keys, refused by orjson
+    assert json.loads(codec.dumps({1: 'a'}).decode('utf-8')) == {'1': 'a'}
+
+
+def test_get_codec():
+    assert get_codec('auto').name in installed()
+    assert isinstance(get_codec('json'), JSONCodec)
+    codec = JSONCodec()
+    assert get_codec(codec) is codec
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+
+
+class RecordingCodec(JSONCodec):
+
+    def __init__(self):
+        self.calls = []
+
+    def dumps(self, obj):
+        self.calls.append('dumps')
+        return super(RecordingCodec, self).dumps(obj)
+
+    def loads(self, data):
+        self.calls.append('loads')
+        return super(RecordingCodec, self).loads(data)
+
+
+class EchoTransport(object):
+    """Transport answering with the JSON body of the request."""
+
+    def request(self, method, url, data=None, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = data
+        response.url = url
+        self.data = data
+        return response
+
+    def close(self):
+        pass
+
+
+def test_client_codec():
+    codec = RecordingCodec()
+    transport = EchoTransport()
+    z = Pipedream('token', json_codec=codec, transport=transport)
+    assert z.source_update('dc_abc', {'name': 'orders'}) == {'name': 'orders'}
+    assert transport.data == b'{"name":"orders"}'
+    assert codec.calls == ['dumps', 'loads']
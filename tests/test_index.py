@@ -0,0 +1,141 @@
+import json
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from pipedreamer import Pipedream, PipedreamError
+from pipedreamer.index import ResourceIndex
+
+SOURCES = [
+    {'id': 'dc_a', 'name': 'orders', 'active': True},
+    {'id': 'dc_b', 'name': 'refunds', 'active': True},
+]
+SUBSCRIPTIONS = [
+    {'id': 'sub_1', 'emitter_id': 'dc_a', 'listener_id': 'p_x',
+     'event_name': ''},
+    {'id': 'sub_2', 'emitter_id': 'dc_a', 'listener_id': 'p_y',
+     'event_name': 'created'},
+]
+
+
+class SourcesAPI(object):
+    """Transport listing sources and subscriptions and answering the
+    changes made to them, without applying them: only the hooks of the
+    index can make them show up.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        path = urlsplit(url).path[len('/v1'):].rstrip('/')
+        self.requests.append((method, path))
+        if path == '/users/me/sources':
+            content = {'page_info': {'total_count': len(SOURCES),
+                                     'count': len(SOURCES)},
+                       'data': SOURCES}
+        elif path == '/users/me/subscriptions':
+            content = {'data': SUBSCRIPTIONS}
+        elif path == '/sources' and method == 'POST':
+            content = {'data': dict(json.loads(data), id='dc_c')}
+        elif path == '/subscriptions' and method == 'POST':
+            content = {'data': {'id': 'sub_3'}}
+        else:
+            content = {}
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(content).encode('utf-8')
+        response.url = url
+        response.request = requests.Request(
+            method, url, params=params, data=data).prepare()
+        return response
+
+    def close(self):
+        pass
+
+    def listings(self):
+        return [r for r in self.requests if r[0] == 'GET']
+
+
+def make_index(**kwargs):
+    api = SourcesAPI()
+    z = Pipedream('token', transport=api)
+    return z, api, ResourceIndex(z, **kwargs)
+
+
+def test_lookups():
+    z, api, index = make_index()
+    assert api.requests == []
+    assert index.source_by_name('orders') == SOURCES[0]
+    assert index.source('dc_b') == SOURCES[1]
+    assert index.source('dc_c') is None
+    assert index.subscription('sub_2') == SUBSCRIPTIONS[1]
+    assert index.subscription_for('dc_a', 'p_x')['id'] == 'sub_1'
+    assert index.subscription_for('dc_a', 'p_y', 'created')['id'] == 'sub_2'
+    assert [s['id'] for s in index.subscriptions_by_emitter('dc_a')] == \
+        ['sub_1', 'sub_2']
+    assert index.subscriptions_by_listener('p_z') == ()
+    # Loaded once
+    assert len(api.listings()) == 2
+
+
+def test_refresh_interval():
+    z, api, index = make_index(refresh_interval=0)
+    index.sources()
+    index.sources()
+    assert len(api.listings()) == 4
+
+
+def test_source_changes_followed():
+    z, api, index = make_index()
+    index.sources()
+    z.source_update('dc_a', {'name': 'purchases'})
+    assert index.source_by_name('orders') is None
+    assert index.source_by_name('purchases') == \
+        dict(SOURCES[0], name='purchases')
+
+    z.sources__create({'component_id': 'sc_a', 'name': 'payments'})
+    assert index.source_by_name('payments')['id'] == 'dc_c'
+
+    z.source_delete('dc_b')
+    assert index.source('dc_b') is None
+    assert index.source_by_name('refunds') is None
+    assert sorted(s['id'] for s in index.sources()) == ['dc_a', 'dc_c']
+    # Followed without reloading
+    assert len(api.listings()) == 2
+
+
+def test_subscription_changes_followed():
+    z, api, index = make_index()
+    index.subscriptions()
+    z.subscription_create(None, emitter_id='dc_b', listener_id='p_x')
+    assert index.subscription('sub_3') == \
+        {'id': 'sub_3', 'emitter_id': 'dc_b', 'listener_id': 'p_x',
+         'event_name': None}
+    assert [s['id'] for s in index.subscriptions_by_listener('p_x')] == \
+        ['sub_1', 'sub_3']
+
+    z.subscriptions_delete(emitter_id='dc_a', listener_id='p_y',
+                           event_name='created')
+    assert index.subscription('sub_2') is None
+    assert index.subscription_for('dc_a', 'p_y', 'created') is None
+    assert [s['id'] for s in index.subscriptions_by_emitter('dc_a')] == \
+        ['sub_1']
+    assert len(api.listings()) == 2
+
+
+def test_failed_and_detached_changes_ignored():
+    z, api, index = make_index()
+    index.sources()
+    api.status = 404
+    with pytest.raises(PipedreamError):
+        z.source_delete('dc_a')
+    assert index.source('dc_a') == SOURCES[0]
+
+    api.status = 200
+    index.detach()
+    z.source_delete('dc_a')
+    assert index.source('dc_a') == SOURCES[0]
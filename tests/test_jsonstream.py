@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from pipedreamer.jsonstream import JSONArrayStream
+
+PAGE = {
+    'page_info': {'total_count': 3, 'count': 3, 'end_cursor': 'c3'},
+    'data': [
+        {'id': 'e1', 'event': {'text': 'quote " backslash \\ slash /'}},
+        {'id': 'e2', 'event': {'text': u'café ☃ \U0001f600',
+                               'escaped': '\\u00e9 \\n'}},
+        {'id': 'e3', 'event': [1, -2.5e3, True, False, None, '}]{[']},
+    ],
+    'extra': {'nested': ['a', {'b': 1}]},
+}
+
+
+def chunks(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 1 << 20])
+def test_split_chunks(size):
+    body = json.dumps(PAGE, ensure_ascii=False).encode('utf-8')
+    stream = JSONArrayStream(chunks(body, size))
+    assert list(stream) == PAGE['data']
+    assert stream.rest == {'page_info': PAGE['page_info'],
+                           'extra': PAGE['extra']}
+
+
+def test_escapes_split_across_chunks():
+    body = json.dumps(PAGE).encode('utf-8')
+    # \u escapes and escaped quotes cut at every offset
+    for offset in range(1, len(body)):
+        stream = JSONArrayStream([body[:offset], body[offset:]])
+        assert list(stream) == PAGE['data']
+
+
+def test_str_chunks_and_whitespace():
+    body = json.dumps(PAGE, indent=4)
+    assert list(JSONArrayStream(chunks(body, 5))) == PAGE['data']
+
+
+def test_number_at_chunk_boundary():
+    stream = JSONArrayStream([b'{"data": [12', b'34, 5', b'6]}'])
+    assert list(stream) == [1234, 56]
+
+
+def test_other_key():
+    stream = JSONArrayStream([b'{"data": [1], "items": [2, 3]}'], 'items')
+    assert list(stream) == [2, 3]
+    assert stream.rest == {'data': [1]}
+
+
+@pytest.mark.parametrize('body', [b'{}', b'{"data": []}'])
+def test_empty(body):
+    assert list(JSONArrayStream([body])) == []
+
+
+@pytest.mark.parametrize('body', [b'', b'[1, 2]', b'{"data": [1, 2',
+                                  b'{"data": [1 2]}', b'{"data": [1}'])
+def test_invalid(body):
+    with pytest.raises(ValueError):
+        list(JSONArrayStream(chunks(body, 3)))
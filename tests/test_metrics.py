@@ -0,0 +1,81 @@
+import pytest
+
+from pipedreamer.metrics import Histogram, MetricsCollector, endpoint_name
+
+API = 'https://api.pipedream.com/v1'
+
+
+class Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize('url, name', [
+    (API + '/sources/dc_BVu1Ke/event_summaries?limit=10',
+     '/sources/{id}/event_summaries'),
+    (API + '/workflows/p_abc123/$errors/event_summaries',
+     '/workflows/{id}/$errors/event_summaries'),
+    (API + '/orgs/o_AbCd12/subscriptions', '/orgs/{id}/subscriptions'),
+    (API + '/components/12345', '/components/{id}'),
+    (API + '/users/me/sources/', '/users/me/sources/'),
+    # Endpoint segments looking like ids
+    (API + '/auto_subscriptions', '/auto_subscriptions'),
+    (API + '/sources/dc_BVu1Ke/events', '/sources/{id}/events'),
+])
+def test_endpoint_name(url, name):
+    assert endpoint_name(url) == name
+
+
+def test_quantile():
+    hist = Histogram((1.0, 2.0, 4.0))
+    assert hist.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.quantile(0.25) == 1.0
+    assert hist.quantile(0.5) == 1.5
+    assert hist.quantile(1.0) == 4.0
+    assert hist.cumulative() == [(1.0, 1), (2.0, 3), (4.0, 4),
+                                 (float('inf'), 4)]
+    # Above the last bucket
+    hist.observe(10.0)
+    assert hist.quantile(1.0) == 4.0
+    assert hist.sum == 16.5 and hist.count == 5
+
+
+def test_to_prometheus():
+    metrics = MetricsCollector(buckets=(0.1, 1.0), prefix='pd')
+    url = API + '/sources/dc_BVu1Ke/event_summaries'
+    metrics.after_response('GET', url, Response(500), None, 0.05,
+                           response_size=20)
+    metrics.on_retry('GET', url)
+    metrics.after_response('GET', url, Response(200), None, 0.5,
+                           response_size=100)
+    metrics.on_sleep('retry', 0.25)
+    lines = metrics.to_prometheus().splitlines()
+
+    labels = 'method="GET",endpoint="/sources/{id}/event_summaries"'
+    for line in (
+            '# TYPE pd_request_duration_seconds histogram',
+            'pd_request_duration_seconds_bucket{%s,le="0.1"} 1' % labels,
+            'pd_request_duration_seconds_bucket{%s,le="1.0"} 2' % labels,
+            'pd_request_duration_seconds_bucket{%s,le="+Inf"} 2' % labels,
+            'pd_request_duration_seconds_sum{%s} 0.55' % labels,
+            'pd_request_duration_seconds_count{%s} 2' % labels,
+            'pd_requests_total{%s,status="200"} 1' % labels,
+            'pd_requests_total{%s,status="500"} 1' % labels,
+            'pd_retries_total{%s} 1' % labels,
+            'pd_response_bytes_total{%s} 120' % labels,
+            'pd_sleeps_total{reason="retry"} 1',
+            'pd_sleep_seconds_total{reason="retry"} 0.25'):
+        assert line in lines
+    # No decode samples without on_decode
+    assert not [line for line in lines
+                if line.startswith('pd_decode_duration_seconds')]
+
+
+def test_label_escaping():
+    metrics = MetricsCollector(endpoint=lambda url: 'a"b\\c')
+    metrics.after_response('GET', API, None, ValueError(), 0.1)
+    assert 'pipedream_requests_total{method="GET",endpoint="a\\"b\\\\c",' \
+        'status="ValueError"} 1' in metrics.to_prometheus()
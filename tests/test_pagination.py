@@ -0,0 +1,101 @@
+import json
+
+import pytest
+import requests
+
+from pipedreamer import Pipedream
+from pipedreamer.pipedreamer import _cursor_after, _next_cursor
+
+
+def page(ids, end_cursor=None, total=None):
+    page_info = {'count': len(ids), 'end_cursor': end_cursor}
+    if total is not None:
+        page_info['total_count'] = total
+    return {'page_info': page_info, 'data': [{'id': id} for id in ids]}
+
+
+class PagesAPI(object):
+    """Transport answering with the given bodies in turn."""
+
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.cursors = []
+
+    def request(self, method, url, params=None, **kwargs):
+        assert self.bodies, 'Unexpected request'
+        self.cursors.append((params or {}).get('after'))
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(self.bodies.pop(0)).encode('utf-8')
+        response.url = url
+        return response
+
+    def close(self):
+        pass
+
+
+def test_cursor_after():
+    assert _cursor_after({'end_cursor': 'b'}, 2, None, 0) == (2, 'b')
+    assert _cursor_after({'end_cursor': 'd', 'total_count': 5}, 2,
+                         'b', 2) == (4, 'd')
+    # Empty page
+    assert _cursor_after({'end_cursor': 'b'}, 0, 'b', 2) == (2, None)
+    # No cursor
+    assert _cursor_after({'end_cursor': None}, 2, None, 0) == (2, None)
+    # The cursor the page was requested with
+    assert _cursor_after({'end_cursor': 'b'}, 2, 'b', 2) == (4, None)
+    # Every item received
+    assert _cursor_after({'end_cursor': 'e', 'total_count': 5}, 1,
+                         'd', 4) == (5, None)
+
+
+def test_next_cursor():
+    assert _next_cursor(page(['a', 'b'], 'b', 5), None, 0) == (2, 'b')
+    assert _next_cursor({'data': {'id': 'a'}}, None, 0) == (0, None)
+    assert _next_cursor([1, 2], 'b', 2) == (2, None)
+
+
+@pytest.mark.parametrize('prefetch', [None, 2])
+def test_get_all_pages(prefetch):
+    api = PagesAPI(page(['a', 'b'], 'b', 5), page(['c', 'd'], 'd', 5),
+                   page(['e'], 'e', 5))
+    z = Pipedream('token', transport=api)
+    result = z.source_event_summaries('dc_a', limit=2, get_all_pages=True,
+                                      prefetch=prefetch)
+    assert [e['id'] for e in result['data']] == ['a', 'b', 'c', 'd', 'e']
+    assert result['page_info']['count'] == 5
+    assert api.cursors == [None, 'b', 'd']
+
+
+@pytest.mark.parametrize('last', [
+    # Empty page
+    page([], 'd'),
+    # Repeated cursor
+    page(['c', 'd'], 'b'),
+])
+def test_get_all_pages_stops(last):
+    api = PagesAPI(page(['a', 'b'], 'b'), last)
+    z = Pipedream('token', transport=api)
+    result = z.source_event_summaries('dc_a', get_all_pages=True)
+    assert [e['id'] for e in result['data']] == \
+        ['a', 'b'] + [e['id'] for e in last['data']]
+    assert api.cursors == [None, 'b']
+
+
+def test_get_all_pages_not_a_page():
+    api = PagesAPI({'data': {'id': 'u_a'}})
+    z = Pipedream('token', transport=api)
+    assert z.users_me(get_all_pages=True) == {'data': {'id': 'u_a'}}
+
+
+def test_iter_items():
+    api = PagesAPI(page(['a', 'b'], 'b', 3), page(['c'], 'c', 3))
+    z = Pipedream('token', transport=api)
+    items = z.iter_items('source_event_summaries', 'dc_a', limit=2)
+    # Nothing is fetched before the generator is consumed
+    assert api.cursors == []
+    assert next(items) == {'id': 'a'}
+    assert api.cursors == [None]
+    assert [e['id'] for e in items] == ['b', 'c']
+    assert api.cursors == [None, 'b']
@@ -0,0 +1,164 @@
+import json
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from pipedreamer import Pipedream
+from pipedreamer.reconcile import (Reconciler, Subscription, Webhook, diff,
+                                   subscription, webhook)
+
+
+class FakeAPI(object):
+    """Transport keeping subscriptions and webhooks in memory."""
+
+    def __init__(self, subscriptions=(), webhooks=()):
+        self.subscriptions = [dict(s) for s in subscriptions]
+        self.webhooks = [dict(w) for w in webhooks]
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, params=None, **kwargs):
+        path = urlsplit(url).path[len('/v1'):].rstrip('/')
+        params = dict((k, v) for k, v in (params or {}).items()
+                      if v is not None)
+        with self.lock:
+            self.requests.append((method, path, params))
+            content = self.handle(method, path, params)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(content).encode('utf-8')
+        response.url = url
+        return response
+
+    def handle(self, method, path, params):
+        if path == '/users/me/subscriptions':
+            return {'data': self.subscriptions}
+        if path == '/users/me/webhooks':
+            return {'page_info': {'total_count': len(self.webhooks),
+                                  'count': len(self.webhooks)},
+                    'data': self.webhooks}
+        if path == '/subscriptions' and method == 'POST':
+            self.subscriptions.append(dict(params, id='sub_%d' % len(
+                self.requests)))
+            return {}
+        if path == '/subscriptions' and method == 'DELETE':
+            self.subscriptions = [s for s in self.subscriptions
+                                  if subscription(s) != subscription(params)]
+            return {}
+        if path == '/webhooks' and method == 'POST':
+            record = dict(params, id='hook_%d' % len(self.requests))
+            self.webhooks.append(record)
+            return {'data': record}
+        if path.startswith('/webhooks/') and method == 'DELETE':
+            id = path.split('/')[-1]
+            self.webhooks = [w for w in self.webhooks if w['id'] != id]
+            return {}
+        raise AssertionError('Unexpected request %s %s' % (method, path))
+
+    def mutations(self):
+        return sorted((m, p, tuple(sorted(q.items())))
+                      for m, p, q in self.requests if m != 'GET')
+
+    def close(self):
+        pass
+
+
+def test_diff():
+    current = [('a', 1), ('b', 2), ('b', 3), ('c', 4)]
+    plan = diff(['a', 'b', 'd', 'd'], current, key=lambda x: x)
+    assert plan.create == ['d']
+    assert plan.unchanged == ['a', 'b']
+    assert sorted(plan.delete) == [('b', 3), ('c', 4)]
+    assert len(plan) == 3
+
+
+def test_diff_without_pruning_or_duplicates():
+    current = [('a', 1), ('b', 2), ('b', 3), ('c', 4), ('c', 5)]
+    plan = diff(['b'], current, key=lambda x: x, prune=False)
+    assert plan.delete == [('b', 3)]
+    plan = diff(['b'], current, key=lambda x: x, duplicates=False)
+    assert sorted(plan.delete) == [('a', 1), ('c', 4)]
+
+
+def test_normalize():
+    assert subscription(('dc_a', 'p_b', '')) == Subscription('dc_a', 'p_b')
+    assert subscription({'emitter_id': 'dc_a', 'listener_id': 'p_b',
+                         'event_name': 'x', 'id': 's'}) == \
+        Subscription('dc_a', 'p_b', 'x')
+    assert webhook('https://h') == Webhook('https://h')
+    assert webhook({'url': 'https://h', 'name': 'n'}) == \
+        Webhook('https://h', 'n')
+
+
+def test_reconcile_subscriptions():
+    api = FakeAPI([
+        {'id': 's1', 'emitter_id': 'dc_a', 'listener_id': 'p_x',
+         'event_name': ''},
+        {'id': 's2', 'emitter_id': 'dc_b', 'listener_id': 'p_x',
+         'event_name': None},
+    ])
+    r = Reconciler(Pipedream('token', transport=api))
+    report = r.reconcile_subscriptions([('dc_a', 'p_x'),
+                                        {'emitter_id': 'dc_c',
+                                         'listener_id': 'p_x',
+                                         'event_name': 'custom'}])
+    assert report.failed == []
+    assert report.created == [Subscription('dc_c', 'p_x', 'custom')]
+    assert report.deleted == [Subscription('dc_b', 'p_x')]
+    assert report.unchanged == [Subscription('dc_a', 'p_x')]
+    assert api.mutations() == [
+        ('DELETE', '/subscriptions', (('emitter_id', 'dc_b'),
+                                      ('listener_id', 'p_x'))),
+        ('POST', '/subscriptions', (('emitter_id', 'dc_c'),
+                                    ('event_name', 'custom'),
+                                    ('listener_id', 'p_x'))),
+    ]
+    assert sorted(subscription(s) for s in api.subscriptions) == [
+        Subscription('dc_a', 'p_x'), Subscription('dc_c', 'p_x', 'custom')]
+
+    # Nothing left to do
+    assert len(r.plan_subscriptions(s for s in api.subscriptions)) == 0
+
+
+def test_reconcile_webhooks():
+    api = FakeAPI(webhooks=[
+        {'id': 'h1', 'url': 'https://a', 'name': 'a'},
+        {'id': 'h2', 'url': 'https://a', 'name': 'duplicate'},
+        {'id': 'h3', 'url': 'https://b'},
+    ])
+    r = Reconciler(Pipedream('token', transport=api), concurrency=2)
+    report = r.reconcile_webhooks(['https://a',
+                                   Webhook('https://c', 'c', 'new')],
+                                  prune=False)
+    assert report.created == [Webhook('https://c', 'c', 'new')]
+    assert report.deleted == [Webhook('https://a', 'duplicate')]
+    assert report.to_dict()['deleted'] == [
+        {'url': 'https://a', 'name': 'duplicate', 'description': None,
+         'id': 'h2'}]
+    assert sorted(w['url'] for w in api.webhooks) == \
+        ['https://a', 'https://b', 'https://c']
+
+
+def test_dry_run():
+    api = FakeAPI(webhooks=[{'id': 'h1', 'url': 'https://a'}])
+    r = Reconciler(Pipedream('token', transport=api))
+    report = r.reconcile_webhooks(['https://b'], dry_run=True)
+    assert report.dry_run
+    assert report.created == [Webhook('https://b')]
+    assert report.deleted == [Webhook('https://a')]
+    assert [c.id for c in report.changes if c.action == 'delete'] == ['h1']
+    assert api.mutations() == []
+
+
+def test_failures_are_reported():
+    api = FakeAPI()
+    api.handle = lambda method, path, params: (
+        {'data': []} if method == 'GET' else 1 / 0)
+    r = Reconciler(Pipedream('token', transport=api))
+    report = r.reconcile_webhooks(['https://a'])
+    assert report.created == []
+    assert [(c.action, c.item) for c in report.failed] == \
+        [('create', Webhook('https://a'))]
+    assert isinstance(report.failed[0].error, ZeroDivisionError)
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from pipedreamer.codec import CODECS
+from pipedreamer.records import (EventSummary, Source, Webhook, decode_page,
+                                 record_type, to_columns)
+
+PAGE = {
+    'page_info': {'total_count': 3, 'count': 3, 'end_cursor': 'e3'},
+    'data': [
+        {'id': 'e1', 'indexed_at_ms': 1700000000000,
+         'metadata': {'emitter_id': 'dc_abc'},
+         'event': {'body': {'text': u'caf\xe9 "quoted"'}, 'n': [1, 2.5]}},
+        {'id': 'e2', 'indexed_at_ms': 1700000000001, 'metadata': None,
+         'event': [None, True, {}]},
+        {'id': 'e3', 'indexed_at_ms': 1700000000002, 'event': 'text',
+         'unknown': 1},
+    ],
+}
+
+
+def codecs():
+    names = []
+    for name in sorted(CODECS):
+        try:
+            names.append(CODECS[name]())
+        except ImportError:
+            pass
+    return names
+
+
+@pytest.mark.parametrize('codec', codecs(), ids=lambda c: c.name)
+def test_equivalent_to_json_loads(codec):
+    body = json.dumps(PAGE).encode('utf-8')
+    page = decode_page(body, EventSummary, codec)
+    expected = json.loads(body.decode('utf-8'))
+    assert page['page_info'] == expected['page_info']
+    assert [type(r) for r in page['data']] == [EventSummary] * 3
+    assert [r.to_dict() for r in page['data']] == [
+        dict(d, metadata=d.get('metadata')) for d in expected['data']]
+    assert page['data'][2].extra == {'unknown': 1}
+
+
+def test_event_decoded_lazily():
+    page = decode_page(json.dumps(PAGE), EventSummary)
+    record = page['data'][0]
+    assert json.loads(record.event_json.decode('utf-8')) == \
+        PAGE['data'][0]['event']
+    assert record._event_raw is not None
+    assert record.event == PAGE['data'][0]['event']
+    assert record._event_raw is None
+    # Not a JSON object or array, decoded with the page
+    assert page['data'][2]._event_raw is None
+    assert page['data'][2].event == 'text'
+
+
+def test_event_decoded_with_codec():
+    class Codec(CODECS['json']):
+        decoded = []
+
+        def loads(self, data):
+            self.decoded.append(data)
+            return super(Codec, self).loads(data)
+
+    page = decode_page(json.dumps(PAGE), EventSummary, Codec())
+    record = page['data'][1]
+    assert len(Codec.decoded) == 1
+    assert record.event == [None, True, {}]
+    assert Codec.decoded[1:] == [b'[null,true,{}]']
+    assert record._loads is None
+
+
+@pytest.mark.parametrize('body', [b'[1, 2]', b'{"data": {"id": "e1"}}',
+                                  b'{"error": "not found"}'])
+def test_not_a_page(body):
+    assert decode_page(body, EventSummary) == json.loads(body.decode())
+
+
+def test_records_without_lazy_fields():
+    page = decode_page(b'{"data": [{"id": "dc_abc", "active": true}, 1]}',
+                       Source)
+    assert page['data'][0].to_dict()['active'] is True
+    assert page['data'][1] == 1
+
+
+def test_record_type():
+    assert record_type('/sources/dc_abc/event_summaries') is EventSummary
+    assert record_type('/users/me/sources/') is Source
+    assert record_type('/users/me/webhooks?limit=2') is Webhook
+    assert record_type('/users/me') is None
+
+
+def test_to_columns():
+    page = decode_page(json.dumps(PAGE), EventSummary)
+    columns = to_columns(page['data'])
+    assert set(columns) == {'id', 'indexed_at_ms', 'metadata'}
+    assert list(columns['indexed_at_ms']) == [d['indexed_at_ms']
+                                              for d in PAGE['data']]
+    assert columns['indexed_at_ms'].typecode == 'q'
+    assert columns['id'] == ['e1', 'e2', 'e3']
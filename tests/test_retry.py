@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+
+import pytest
+import requests
+
+from pipedreamer import (Pipedream, PipedreamError, RateLimitError,
+                         RetryBudget, RetryPolicy)
+
+
+class Response(object):
+
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+def error(code):
+    cls = RateLimitError if code == 429 else PipedreamError
+    return cls(b'', code, None)
+
+
+def test_should_retry():
+    policy = RetryPolicy(retry_on=[500, 429, requests.ConnectionError],
+                         max_retries=2)
+    assert policy.should_retry('GET', error(500), 1)
+    assert policy.should_retry('get', requests.ConnectionError(), 2)
+    # Out of retries
+    assert not policy.should_retry('GET', error(500), 3)
+    # Not in retry_on
+    assert not policy.should_retry('GET', error(502), 1)
+    assert not policy.should_retry('GET', requests.Timeout(), 1)
+
+
+def test_should_retry_idempotent_methods_only():
+    policy = RetryPolicy(retry_on=[500, 429, requests.ConnectionError],
+                         max_retries=2)
+    for method in ('PUT', 'DELETE', 'HEAD', 'OPTIONS'):
+        assert policy.should_retry(method, error(500), 1)
+    assert not policy.should_retry('POST', error(500), 1)
+    assert not policy.should_retry('PATCH', requests.ConnectionError(), 1)
+    # Rate limited requests weren't processed
+    assert policy.should_retry('POST', error(429), 1)
+    assert not policy.should_retry('POST', error(429), 3)
+
+    policy = policy.replace(methods=['GET', 'POST'])
+    assert policy.should_retry('POST', error(500), 1)
+    assert not policy.should_retry('PUT', error(500), 1)
+
+
+def test_should_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    policy = RetryPolicy(retry_on=[500], max_retries=5, budget=budget)
+    assert policy.should_retry('GET', error(500), 1)
+    assert not policy.should_retry('GET', error(500), 2)
+    budget.deposit()
+    budget.deposit()
+    assert policy.should_retry('GET', error(500), 2)
+    # Not taken from the budget when not retried
+    assert not policy.should_retry('GET', error(502), 1)
+    budget.deposit()
+    budget.deposit()
+    assert policy.should_retry('GET', error(500), 3)
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.25, min_retries=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    for _ in range(3):
+        budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    # Successes bank at most min_retries + 100 * ratio retries
+    for _ in range(1000):
+        budget.deposit()
+    assert sum(budget.withdraw() for _ in range(100)) == 27
+
+    with pytest.raises(ValueError):
+        RetryBudget(ratio=-1)
+
+
+def test_delay():
+    random.seed(0)
+    policy = RetryPolicy(backoff=0.5, backoff_max=3)
+    for attempt, cap in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (10, 3.0)):
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= cap
+        assert max(delays) > cap / 2
+    assert policy.delay(1, Response({'Retry-After': '7'})) == 7.0
+    assert policy.delay(1, Response({'Retry-After': '-1'})) == 0.0
+    assert policy.delay(1, Response({'Retry-After': 'soon'})) <= 0.5
+    assert policy.delay(5, Response()) <= 3
+
+
+def test_policy_validation():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_retries=-1)
+    with pytest.raises(ValueError):
+        RetryPolicy(retry_on=[200])
+    with pytest.raises(ValueError):
+        RetryPolicy(backoff=-1)
+
+
+class StatusTransport(object):
+    """Transport answering with the given statuses, then 200."""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.methods = []
+
+    def request(self, method, url, **kwargs):
+        self.methods.append(method)
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0) if self.statuses else 200
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Retry-After'] = '0'
+        response._content = b'{"ok": true}'
+        response.url = url
+        return response
+
+    def close(self):
+        pass
+
+
+def test_client_retries_idempotent_methods_only():
+    transport = StatusTransport(500, 500)
+    z = Pipedream('token', retry_on=[500], max_retries=2,
+                  transport=transport)
+    assert z.source_update('dc_a', {'name': 'a'}) == {'ok': True}
+    assert transport.methods == ['PUT'] * 3
+
+    transport = StatusTransport(500)
+    z = Pipedream('token', retry_on=[500], max_retries=2,
+                  transport=transport)
+    with pytest.raises(PipedreamError):
+        z.sources__create({'component_id': 'sc_a'})
+    assert transport.methods == ['POST']
+
+
+def test_client_retries_rate_limited_posts():
+    transport = StatusTransport(429, 429)
+    z = Pipedream('token', retry_on=[429], max_retries=2,
+                  transport=transport)
+    assert z.sources__create({'component_id': 'sc_a'}) == {'ok': True}
+    assert transport.methods == ['POST'] * 3
+
+
+def test_call_retry_opt_in():
+    transport = StatusTransport(500, 500)
+    z = Pipedream('token', transport=transport)
+    assert z.sources__create({'component_id': 'sc_a'}, retry_on=[500],
+                             max_retries=2) == {'ok': True}
+    assert transport.methods == ['POST'] * 3
+
+
+class GateTransport(StatusTransport):
+    """StatusTransport holding requests until release is set."""
+
+    def __init__(self, *statuses):
+        super(GateTransport, self).__init__(*statuses)
+        self.release = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        response = super(GateTransport, self).request(method, url, **kwargs)
+        self.release.wait(5)
+        return response
+
+
+def concurrent_calls(z, transport, *calls):
+    results = [None] * len(calls)
+
+    def run(i, kwargs):
+        try:
+            results[i] = z.source_event_summaries('dc_a', **kwargs)
+        except PipedreamError as e:
+            results[i] = e.error_code
+
+    threads = []
+    for i, kwargs in enumerate(calls):
+        threads.append(threading.Thread(target=run, args=(i, kwargs)))
+        threads[-1].start()
+        # Wait for the first call to be in flight
+        while not transport.methods:
+            time.sleep(0.001)
+    time.sleep(0.1)
+    transport.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_coalesced_calls_share_retry_policy():
+    transport = GateTransport(500)
+    z = Pipedream('token', transport=transport)
+    assert concurrent_calls(z, transport, {}, {}) == [500, 500]
+    assert transport.methods == ['GET']
+
+
+def test_call_retry_opt_in_not_coalesced():
+    transport = GateTransport(500)
+    z = Pipedream('token', transport=transport)
+    assert concurrent_calls(z, transport, {},
+                            {'retry_on': [500], 'max_retries': 1}) == \
+        [500, {'ok': True}]
+    assert transport.methods == ['GET'] * 2
@@ -0,0 +1,108 @@
+import json
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from pipedreamer import Pipedream
+from pipedreamer.sync import (EventSync, FileCheckpointStore,
+                              SqliteCheckpointStore)
+
+
+def make_events(start, stop):
+    """Events start to stop - 1, newest first."""
+    return [{'id': 'e%03d' % i, 'indexed_at_ms': 1000 + i}
+            for i in reversed(range(start, stop))]
+
+
+class EventsAPI(object):
+    """Transport serving the event summaries of a source, newest first,
+    paginated by the id of the last event of the previous page.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.requests = []
+
+    def request(self, method, url, params=None, **kwargs):
+        path = urlsplit(url).path
+        assert method == 'GET' and path == '/v1/sources/dc_a/event_summaries'
+        params = params or {}
+        self.requests.append(params.get('after'))
+        start = 0
+        if params.get('after'):
+            start = [e['id'] for e in self.events].index(params['after']) + 1
+        data = self.events[start:start + int(params['limit'])]
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps({
+            'page_info': {'total_count': len(self.events),
+                          'count': len(data),
+                          'end_cursor': data[-1]['id'] if data else None},
+            'data': data}).encode('utf-8')
+        response.url = url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'file':
+        yield FileCheckpointStore(str(tmp_path / 'sync.json'))
+    else:
+        store = SqliteCheckpointStore(str(tmp_path / 'sync.db'))
+        yield store
+        store.close()
+
+
+def event_sync(api, store):
+    return EventSync(Pipedream('token', transport=api), store, limit=3)
+
+
+def test_sync(store):
+    api = EventsAPI(make_events(0, 10))
+    sync = event_sync(api, store)
+    assert list(sync.source_events('dc_a')) == make_events(0, 10)
+    assert api.requests == [None, 'e007', 'e004', 'e001']
+    assert store.load('source:dc_a') == {'high_water': [1009, 'e009']}
+
+    # Nothing new: a single page is fetched
+    del api.requests[:]
+    assert list(sync.source_events('dc_a')) == []
+    assert api.requests == [None]
+    assert store.load('source:dc_a') == {'high_water': [1009, 'e009']}
+
+    # Only the events newer than the high-water mark
+    api.events = make_events(0, 14)
+    handled = []
+    assert sync.sync_source('dc_a', handled.append) == 4
+    assert handled == make_events(10, 14)
+    assert store.load('source:dc_a') == {'high_water': [1013, 'e013']}
+
+
+def test_interrupted_sync_resumes(store):
+    api = EventsAPI(make_events(0, 10))
+    events = event_sync(api, store).source_events('dc_a')
+    first = [next(events) for _ in range(4)]
+    events.close()
+    assert first == make_events(6, 10)
+    # The first page was consumed, the second one is pending
+    assert store.load('source:dc_a') == {
+        'high_water': None,
+        'pending': {'high_water': [1009, 'e009'], 'cursor': 'e007'}}
+
+    # Resumed with a new EventSync from the page being consumed
+    del api.requests[:]
+    rest = list(event_sync(api, store).source_events('dc_a'))
+    assert rest == make_events(0, 7)
+    assert api.requests[0] == 'e007'
+    assert store.load('source:dc_a') == {'high_water': [1009, 'e009']}
+
+
+def test_stream_rejected(store):
+    sync = event_sync(EventsAPI([]), store)
+    with pytest.raises(ValueError):
+        sync.source_events('dc_a', stream=True)